@@ -11,6 +11,8 @@ import socketio
 from app.config import validate_settings, settings, setup_logging
 from app.orchestrator.session_manager import SessionManager
 from app.orchestrator.conversation import ConversationOrchestrator
+from app.orchestrator.turn_queue import TurnQueue
+from app.services.inventory_sweeper import InventorySweeper
 
 
 fastapi_app = FastAPI(title="Horticulture Chatbot Backend", version="0.1.0")
@@ -73,6 +75,13 @@ if os.path.isdir(_STATIC_DIR):
 # Core singletons
 sessions = SessionManager()
 orchestrator = ConversationOrchestrator(sessions=sessions)
+# Serializes turns per session; messages sent while a turn is running are merged into the next one
+turn_queue = TurnQueue()
+inventory_sweeper = InventorySweeper(
+    orchestrator.db,
+    interval=settings.INVENTORY_SWEEP_SECONDS,
+    batch_size=settings.INVENTORY_SWEEP_BATCH,
+)
 
 
 @fastapi_app.on_event("startup")
@@ -86,6 +95,17 @@ def _startup_validate_config():
         raise
 
 
+@fastapi_app.on_event("startup")
+async def _startup_inventory_sweeper():
+    if settings.INVENTORY_SWEEP_SECONDS > 0:
+        inventory_sweeper.start()
+
+
+@fastapi_app.on_event("shutdown")
+async def _shutdown_inventory_sweeper():
+    await inventory_sweeper.stop()
+
+
 @fastapi_app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -104,6 +124,14 @@ async def get_session(session_id: str) -> Dict[str, Any]:
     return data or {}
 
 
+@fastapi_app.get("/api/router/stats")
+def router_stats() -> Dict[str, Any]:
+    """Per-intent routing counters: how many turns the rule tier answered without the LLM."""
+    if orchestrator.router is None:
+        return {"mode": "llm"}
+    return {"mode": "tiered", **orchestrator.router.stats.snapshot()}
+
+
 # ---------------- WebSocket fallback ----------------
 @fastapi_app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
@@ -111,8 +139,9 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     try:
         while True:
             text = await websocket.receive_text()
-            reply = await orchestrator.process_message(session_id, text)
-            await websocket.send_text(json.dumps(reply))
+            reply = await turn_queue.submit(session_id, text, lambda t: orchestrator.process_message(session_id, t))
+            if reply is not None:
+                await websocket.send_text(json.dumps(reply))
     except WebSocketDisconnect:
         return
 
@@ -155,14 +184,29 @@ async def message(sid, data):  # type: ignore[no-redef]
             await sio.emit("session", {"sessionId": session_id}, to=sid)
         if not text:
             return
-        await sio.emit("typing", {"isTyping": True}, to=sid)
-        reply = await orchestrator.process_message(session_id, text)
-        await sio.emit("response", {"sessionId": session_id, **reply}, to=sid)
+        # Streaming is opt-in per message (`stream: true`) or server-wide via STREAM_RESPONSES
+        stream = bool((data or {}).get("stream", settings.STREAM_RESPONSES))
+
+        async def _run_turn(turn_text: str) -> None:
+            await sio.emit("typing", {"isTyping": True}, to=sid)
+            try:
+                if stream:
+                    async for ev in orchestrator.stream_message(session_id, turn_text):
+                        if ev.get("type") == "delta":
+                            await sio.emit("response_delta", {"sessionId": session_id, "content": ev.get("content", "")}, to=sid)
+                        else:
+                            await sio.emit("response", {"sessionId": session_id, **(ev.get("reply") or {})}, to=sid)
+                else:
+                    reply = await orchestrator.process_message(session_id, turn_text)
+                    await sio.emit("response", {"sessionId": session_id, **reply}, to=sid)
+            finally:
+                await sio.emit("typing", {"isTyping": False}, to=sid)
+
+        # Messages that pile up behind a running turn are answered together by the next one
+        await turn_queue.submit(session_id, text, _run_turn)
     except Exception as e:
         logging.getLogger(__name__).exception("Socket message handler failed: %s", e)
         await sio.emit("app_error", {"message": str(e)}, to=sid)
-    finally:
-        await sio.emit("typing", {"isTyping": False}, to=sid)
 
 
 # Wrap FastAPI app with Socket.IO ASGIApp at default path '/socket.io'
@@ -89,11 +89,24 @@ class OrderItem(Base):
     # subtotal is generated column in DB; SQLAlchemy can compute if needed
 
 
+class OrderItemAllocation(Base):
+    """Quantity of an order line filled from one inventory lot."""
+
+    __tablename__ = "order_item_allocations"
+
+    allocation_id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(Integer, ForeignKey("order_items.item_id", ondelete="CASCADE"), nullable=False)
+    inventory_id = Column(Integer, ForeignKey("inventory.inventory_id"), nullable=False)
+    quantity_kg = Column(Numeric(10, 2), nullable=False)
+    price_per_unit = Column(Numeric(10, 2), nullable=False)
+
+
 class CompetitorPricing(Base):
     __tablename__ = "competitor_pricing"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(Date, nullable=False)
+    # Monthly range partition key, part of the primary key (scripts/init_db.py)
+    date = Column(Date, nullable=False, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.product_id"))
     product_name = Column(String(100))
     price = Column(Numeric(10, 2), nullable=False)
@@ -105,9 +118,27 @@ class TransactionHistory(Base):
     __tablename__ = "transaction_history"
 
     transaction_id = Column(Integer, primary_key=True, autoincrement=True)
-    order_date = Column(DateTime, nullable=False)
+    # Monthly range partition key, part of the primary key (scripts/init_db.py)
+    order_date = Column(DateTime, nullable=False, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.product_id"))
     product_name = Column(String(100))
     quantity_ordered = Column(Numeric(10, 2))
     price_per_unit = Column(Numeric(10, 2))
     order_total_amount = Column(Numeric(10, 2))
+
+
+class PricingDailyRollup(Base):
+    """Per-day price aggregates maintained by scripts/load_dataset.py."""
+
+    __tablename__ = "pricing_daily_rollup"
+
+    product_id = Column(Integer, ForeignKey("products.product_id"), primary_key=True)
+    # "competitor" (competitor_pricing) or "transaction" (transaction_history)
+    source = Column(String(20), primary_key=True)
+    # competitor source_market_type; '' for transactions
+    market = Column(String(50), primary_key=True, default="")
+    day = Column(Date, primary_key=True)
+    n = Column(Integer, nullable=False)
+    price_sum = Column(Numeric(14, 2), nullable=False)
+    price_min = Column(Numeric(10, 2), nullable=False)
+    price_max = Column(Numeric(10, 2), nullable=False)
@@ -37,6 +37,61 @@ class IntentDetector:
     def detect(self, text: str) -> Dict[str, Any]:
         """Return {intent: str, entities: dict}. Adds light rule fallback for reliability."""
         # 1) Lightweight rule-based shortcut for common cases (no network needed)
+        ruled = self.detect_rules(text)
+        if ruled is not None:
+            return ruled
+        entities: Dict[str, Any] = {}
+        phone = _extract_phone((text or "").strip())
+        if phone:
+            entities["phone"] = phone
+
+        # 2) LLM-based detection (may be unavailable without network)
+        prompt = (
+            "You are an intent classifier for a horticulture marketplace chatbot.\n"
+            "Classify the user's latest message into ONE of the following intents exactly:\n"
+            f"{', '.join(INTENTS)}\n\n"
+            "Also extract simple entities if present: product_name(s), quantity_kg (numeric), dates, location, phone (phone number), name, and delivery_location.\n"
+            "Respond ONLY as compact JSON with keys 'intent' and 'entities'. Do not add explanations.\n\n"
+            f"User message: {text}"
+        )
+        try:
+            resp = self.model.generate_content(prompt)
+            raw = getattr(resp, "text", "") or ""
+            # Strip code fences if present
+            raw = raw.strip()
+            if raw.startswith("```"):
+                raw = raw.strip("`\n")
+                if raw.lower().startswith("json"):
+                    raw = raw[4:]
+            data = json.loads(raw)
+            intent = data.get("intent")
+            if intent not in INTENTS:
+                intent = "general_chat"
+            ents = data.get("entities") or {}
+            # Normalize possible variant keys to canonical names
+            phone2 = ents.get("phone") or ents.get("phone_number") or ents.get("phoneNumber")
+            if phone2 and "phone" not in entities:
+                entities["phone"] = str(phone2)
+            if ents.get("name"):
+                entities.setdefault("name", ents.get("name"))
+            if ents.get("location") or ents.get("delivery_location"):
+                entities.setdefault("location", ents.get("location") or ents.get("delivery_location"))
+            # Carry over other useful entities untouched
+            for k in ("product_name", "product_names", "quantity_kg", "dates"):
+                if k in ents and k not in entities:
+                    entities[k] = ents[k]
+            return {"intent": intent, "entities": entities}
+        except Exception:
+            # Fallback minimal structure retaining rule-extracted entities
+            return {"intent": "general_chat", "entities": entities}
+
+    def detect_rules(self, text: str) -> Dict[str, Any] | None:
+        """
+        Deterministic, network-free intent rules.
+
+        Returns {intent, entities} when a rule matches, otherwise None so callers
+        can decide whether to fall back to an LLM.
+        """
         t = (text or "").strip()
         entities: Dict[str, Any] = {}
 
@@ -156,6 +211,10 @@ class IntentDetector:
                     pass
             return {"intent": "flash_sale_check", "entities": entities}
 
+        # Supplier stock heuristics: questions about the supplier's own inventory
+        if any(k in lt for k in ["my inventory", "my stock", "check stock", "stock level", "what do i have in stock", "what i have in stock"]):
+            return {"intent": "check_stock", "entities": entities}
+
         # Customer orders heuristics
         if any(k in lt for k in ["my orders", "orders i have", "order history", "orders i've", "orders i placed", "what orders", "show my orders"]):
             # Reuse week parsing similar to schedule
@@ -214,45 +273,7 @@ class IntentDetector:
         if any(tok in lt for tok in image_tokens_en) or any(tok in (text or "") for tok in image_tokens_am):
             return {"intent": "image_generation", "entities": entities}
 
-        # 2) LLM-based detection (may be unavailable without network)
-        prompt = (
-            "You are an intent classifier for a horticulture marketplace chatbot.\n"
-            "Classify the user's latest message into ONE of the following intents exactly:\n"
-            f"{', '.join(INTENTS)}\n\n"
-            "Also extract simple entities if present: product_name(s), quantity_kg (numeric), dates, location, phone (phone number), name, and delivery_location.\n"
-            "Respond ONLY as compact JSON with keys 'intent' and 'entities'. Do not add explanations.\n\n"
-            f"User message: {text}"
-        )
-        try:
-            resp = self.model.generate_content(prompt)
-            raw = getattr(resp, "text", "") or ""
-            # Strip code fences if present
-            raw = raw.strip()
-            if raw.startswith("```"):
-                raw = raw.strip("`\n")
-                if raw.lower().startswith("json"):
-                    raw = raw[4:]
-            data = json.loads(raw)
-            intent = data.get("intent")
-            if intent not in INTENTS:
-                intent = "general_chat"
-            ents = data.get("entities") or {}
-            # Normalize possible variant keys to canonical names
-            phone2 = ents.get("phone") or ents.get("phone_number") or ents.get("phoneNumber")
-            if phone2 and "phone" not in entities:
-                entities["phone"] = str(phone2)
-            if ents.get("name"):
-                entities.setdefault("name", ents.get("name"))
-            if ents.get("location") or ents.get("delivery_location"):
-                entities.setdefault("location", ents.get("location") or ents.get("delivery_location"))
-            # Carry over other useful entities untouched
-            for k in ("product_name", "product_names", "quantity_kg", "dates"):
-                if k in ents and k not in entities:
-                    entities[k] = ents[k]
-            return {"intent": intent, "entities": entities}
-        except Exception:
-            # Fallback minimal structure retaining rule-extracted entities
-            return {"intent": "general_chat", "entities": entities}
+        return None
 
 
 _PHONE_PATTERNS = [
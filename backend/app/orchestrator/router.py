@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+from app.models.state_machine import StateMachine, States
+from app.orchestrator.intent_detector import _extract_phone
+
+
+# Intents the rule tier can answer end-to-end with a single tool call
+FAST_PATH_INTENTS = (
+    "registration_customer",
+    "registration_supplier",
+    "check_stock",
+    "check_schedule",
+    "flash_sale_check",
+    "add_inventory",
+    "check_customer_orders",
+)
+
+_SUPPLIER_INTENTS = {"check_stock", "check_schedule", "flash_sale_check", "add_inventory"}
+
+_INTENT_STATES = {
+    "registration_customer": States.REGISTERING,
+    "registration_supplier": States.REGISTERING,
+    "place_order": States.ORDERING,
+    "add_inventory": States.ADDING_INVENTORY,
+    "product_inquiry": States.QUERYING,
+    "knowledge_query": States.QUERYING,
+    "image_generation": States.QUERYING,
+    "check_stock": States.QUERYING,
+    "check_schedule": States.QUERYING,
+    "flash_sale_check": States.QUERYING,
+    "general_chat": States.IDLE,
+}
+
+
+class RouterStats:
+    """
+    In-process counters of how turns were routed, per intent.
+
+    Routes: "fast_path" (answered by rules + tool, no LLM), "llm" (deferred to the
+    LLM tool loop) and "fallback" (fast path attempted but the tool failed, so the
+    LLM handled it).
+    """
+
+    ROUTES = ("fast_path", "llm", "fallback")
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, intent: str, route: str) -> None:
+        with self._lock:
+            per = self._counts.setdefault(intent, {r: 0 for r in self.ROUTES})
+            per[route] = per.get(route, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            intents: Dict[str, Dict[str, Any]] = {}
+            totals = {r: 0 for r in self.ROUTES}
+            for intent, per in sorted(self._counts.items()):
+                n = sum(per.values())
+                intents[intent] = {**per, "total": n, "hit_rate": round(per["fast_path"] / n, 4) if n else 0.0}
+                for r in self.ROUTES:
+                    totals[r] += per[r]
+        total = sum(totals.values())
+        return {
+            "total_turns": total,
+            **totals,
+            # Every fast-path turn skips at least one gemini-2.5-pro round trip
+            "llm_turns_avoided": totals["fast_path"],
+            "fast_path_rate": round(totals["fast_path"] / total, 4) if total else 0.0,
+            "intents": intents,
+        }
+
+
+class TieredRouter:
+    """
+    Rule tier ahead of the LLM.
+
+    Rule-matched intents with complete entities go straight to the ToolRegistry
+    and are answered with the tool's templated message. Anything else (no rule
+    match, missing entities, wrong role, disabled intent, tool failure) returns
+    None so the caller continues with the LLM tool loop.
+    """
+
+    def __init__(self, tools: Any, sessions: Any, detector: Any,
+                 intents: Optional[Iterable[str]] = None,
+                 stats: Optional[RouterStats] = None) -> None:
+        self.tools = tools
+        self.sessions = sessions
+        self.detector = detector
+        self.intents = set(intents if intents is not None else _configured_intents())
+        self.stats = stats or RouterStats()
+
+    async def route(self, session_id: str, session: Dict[str, Any], user_message: str) -> Optional[Dict[str, Any]]:
+        logger = logging.getLogger(__name__)
+        context = dict(session.get("context") or {})
+        sm = StateMachine(context.get("current_flow") or States.IDLE)
+
+        # Mid-registration and the user sent just a phone number: finish registration directly
+        if sm.state == States.REGISTERING and not session.get("registered"):
+            phone = _extract_phone(user_message)
+            if phone:
+                last_intent = context.get("last_intent")
+                if last_intent not in ("registration_customer", "registration_supplier"):
+                    last_intent = "registration_customer"
+                return await self._dispatch(session_id, session, last_intent, {"phone": phone})
+
+        detected = self.detector.detect_rules(user_message)
+        if not detected:
+            self.stats.record("unmatched", "llm")
+            return None
+        intent = detected.get("intent") or "general_chat"
+        entities = detected.get("entities") or {}
+        try:
+            logger.info("ROUTE session=%s intent=%s", session_id, intent)
+        except Exception:
+            pass
+
+        # Track the conversational flow so follow-ups (e.g. a bare phone number) can be routed
+        next_state = _INTENT_STATES.get(intent)
+        if next_state and sm.can_transition(next_state):
+            sm.transition(next_state)
+        if context.get("current_flow") != sm.state or context.get("last_intent") != intent:
+            context["current_flow"] = sm.state
+            context["last_intent"] = intent
+            await self.sessions.update_session(session_id, {"context": context})
+            session["context"] = context
+
+        return await self._dispatch(session_id, session, intent, entities)
+
+    async def _dispatch(self, session_id: str, session: Dict[str, Any], intent: str, entities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        call = self._tool_call_for(intent, entities, session) if intent in self.intents else None
+        if call is None:
+            self.stats.record(intent, "llm")
+            return None
+        name, args = call
+        result = await self.tools.execute(name, args, session_id=session_id)
+        if not result.get("success"):
+            logging.getLogger(__name__).info("ROUTE fallback intent=%s tool=%s: %s", intent, name, result.get("message"))
+            self.stats.record(intent, "fallback")
+            return None
+        self.stats.record(intent, "fast_path")
+        return {
+            "type": "text",
+            "content": result.get("message", ""),
+            "metadata": {"intent": intent, "route": "fast_path"},
+        }
+
+    def _tool_call_for(self, intent: str, entities: Dict[str, Any], session: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Map a rule-matched intent to (tool, args), or None when entities/role are insufficient."""
+        if intent in _SUPPLIER_INTENTS and not (session.get("registered") and session.get("user_type") == "supplier"):
+            return None
+
+        if intent in ("registration_customer", "registration_supplier"):
+            if session.get("registered") or not entities.get("phone"):
+                return None
+            args: Dict[str, Any] = {
+                "user_type": "supplier" if intent == "registration_supplier" else "customer",
+                "phone": entities["phone"],
+            }
+            if entities.get("name"):
+                args["name"] = entities["name"]
+            if entities.get("location"):
+                args["location"] = entities["location"]
+            return "register_user", args
+
+        if intent == "check_stock":
+            return "check_supplier_stock", {}
+
+        if intent == "check_schedule":
+            args = {}
+            if entities.get("start_date") and entities.get("end_date"):
+                args = {"start_date": entities["start_date"], "end_date": entities["end_date"]}
+            return "get_supplier_schedule", args
+
+        if intent == "flash_sale_check":
+            args = {}
+            if entities.get("days"):
+                args["days_threshold"] = int(entities["days"])
+            return "suggest_flash_sale", args
+
+        if intent == "add_inventory":
+            required = ("product_name", "quantity_kg", "price_per_unit", "available_date")
+            if not all(k in entities for k in required):
+                return None
+            args = {k: entities[k] for k in required}
+            if entities.get("expiry_date"):
+                args["expiry_date"] = entities["expiry_date"]
+            if "generate_image" in entities:
+                args["generate_image"] = bool(entities["generate_image"])
+            return "add_inventory", args
+
+        if intent == "check_customer_orders":
+            if not session.get("registered"):
+                return None
+            args = {}
+            if entities.get("start_date") and entities.get("end_date"):
+                args["start_date"] = entities["start_date"]
+                args["end_date"] = entities["end_date"]
+            if entities.get("status"):
+                args["status"] = entities["status"]
+            return "get_customer_orders", args
+
+        return None
+
+
+def _configured_intents() -> Tuple[str, ...]:
+    raw = (settings.ROUTER_FAST_INTENTS or "").strip()
+    if not raw:
+        return FAST_PATH_INTENTS
+    return tuple(t.strip() for t in raw.split(",") if t.strip())
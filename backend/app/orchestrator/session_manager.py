@@ -1,24 +1,85 @@
 from __future__ import annotations
 
+import copy
 import json
 import time
 import uuid
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
 
 from redis import asyncio as aioredis
 
 from app.config import settings
 
 
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+class SessionTurn:
+    """
+    Unit of work over one session for the duration of a conversation turn.
+
+    The session is loaded once when the turn opens. While it is active, reads,
+    updates and history appends made through any SessionManager for the same
+    session id are served from this in-memory copy and tracked as dirty; the
+    owning manager writes everything back in a single flush when the turn closes.
+    """
+
+    def __init__(self, session_id: str, data: Dict[str, Any], is_new: bool = False) -> None:
+        self.session_id = session_id
+        self.data = data
+        # Field names to write back; "conversation_history" is only listed when replaced wholesale
+        self.dirty: Set[str] = set(data.keys()) if is_new else set()
+        self.new_messages: List[Dict[str, Any]] = []
+
+    def update(self, updates: Dict[str, Any]) -> None:
+        # shallow merge for top-level; nested callers should handle deep merge as needed
+        self.data.update(updates)
+        self.data["last_active"] = _now_iso()
+        self.dirty.update(updates.keys())
+        self.dirty.add("last_active")
+
+    def append_message(self, message: Dict[str, Any], max_history: int) -> None:
+        hist = self.data.get("conversation_history") or []
+        hist.append(message)
+        # Trim to recent N
+        if len(hist) > max_history:
+            hist = hist[-max_history:]
+        self.data["conversation_history"] = hist
+        self.data["last_active"] = _now_iso()
+        self.new_messages.append(message)
+        self.dirty.add("last_active")
+
+
+_CURRENT_TURN: ContextVar[Optional[SessionTurn]] = ContextVar("session_turn", default=None)
+
+
 class SessionManager:
     def __init__(self):
         self.redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True, max_connections=50)
         self.ttl = int(settings.SESSION_TTL)
         self.max_history = int(settings.MAX_CONVERSATION_HISTORY)
 
-    async def create_session(self) -> str:
-        session_id = str(uuid.uuid4())
-        data = {
+    # Layout: scalar/top-level fields live in a hash (one JSON-encoded value per field) and
+    # conversation_history in a list, so appends and field updates never rewrite the document.
+    @staticmethod
+    def _meta_key(session_id: str) -> str:
+        return f"session:{session_id}:meta"
+
+    @staticmethod
+    def _history_key(session_id: str) -> str:
+        return f"session:{session_id}:history"
+
+    @staticmethod
+    def _legacy_key(session_id: str) -> str:
+        # Pre-hash layout: the whole session as one JSON string
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _new_session_data(session_id: str) -> Dict[str, Any]:
+        return {
             "session_id": session_id,
             "user_id": None,
             "user_type": "unknown",
@@ -35,41 +96,140 @@ class SessionManager:
             },
             "conversation_history": [],
             "language": "auto",
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "last_active": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "created_at": _now_iso(),
+            "last_active": _now_iso(),
         }
-        await self.redis.setex(f"session:{session_id}", self.ttl, json.dumps(data))
-        return session_id
 
-    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        raw = await self.redis.get(f"session:{session_id}")
+    def _active_turn(self, session_id: str) -> Optional[SessionTurn]:
+        turn = _CURRENT_TURN.get()
+        if turn is not None and turn.session_id == session_id:
+            return turn
+        return None
+
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        meta_key, hist_key = self._meta_key(session_id), self._history_key(session_id)
+        # Read and TTL refresh share one round trip
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(meta_key)
+            pipe.lrange(hist_key, 0, -1)
+            pipe.expire(meta_key, self.ttl)
+            pipe.expire(hist_key, self.ttl)
+            meta, hist, _, _ = await pipe.execute()
+        if not meta:
+            return await self._migrate_legacy(session_id)
+        data = {k: json.loads(v) for k, v in meta.items()}
+        data["conversation_history"] = [json.loads(m) for m in hist]
+        return data
+
+    async def _migrate_legacy(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Read a `session:{id}` JSON document, rewrite it in the hash/list layout and drop it."""
+        raw = await self.redis.get(self._legacy_key(session_id))
         if not raw:
             return None
-        await self.redis.expire(f"session:{session_id}", self.ttl)
-        return json.loads(raw)
+        data = json.loads(raw)
+        data["conversation_history"] = (data.get("conversation_history") or [])[-self.max_history :]
+        await self._write(session_id, data, replace_history=True, drop_legacy=True)
+        return data
+
+    async def _write(self, session_id: str, fields: Dict[str, Any],
+                     new_messages: Optional[List[Dict[str, Any]]] = None,
+                     replace_history: bool = False, drop_legacy: bool = False) -> None:
+        """
+        Persist changed fields and history in one pipeline.
+
+        `fields` may include conversation_history only with `replace_history=True`; otherwise
+        history changes are passed as `new_messages` and appended with RPUSH + LTRIM.
+        """
+        meta_key, hist_key = self._meta_key(session_id), self._history_key(session_id)
+        fields = dict(fields)
+        history = fields.pop("conversation_history", None)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if fields:
+                pipe.hset(meta_key, mapping={k: json.dumps(v) for k, v in fields.items()})
+            if replace_history:
+                pipe.delete(hist_key)
+                messages = history or []
+            else:
+                messages = new_messages or []
+            if messages:
+                pipe.rpush(hist_key, *(json.dumps(m) for m in messages))
+                pipe.ltrim(hist_key, -self.max_history, -1)
+            if drop_legacy:
+                pipe.delete(self._legacy_key(session_id))
+            pipe.expire(meta_key, self.ttl)
+            pipe.expire(hist_key, self.ttl)
+            await pipe.execute()
+
+    async def create_session(self) -> str:
+        session_id = str(uuid.uuid4())
+        await self._write(session_id, self._new_session_data(session_id), replace_history=True)
+        return session_id
+
+    @asynccontextmanager
+    async def turn(self, session_id: str) -> AsyncIterator[SessionTurn]:
+        """
+        Open a per-turn unit of work for `session_id` (creating the session if missing).
+
+        Nested calls for the same session reuse the active turn. Pending changes are
+        flushed when the outermost turn exits, including on error, so partial
+        progress (e.g. the user's message) is kept as it was before.
+        """
+        active = self._active_turn(session_id)
+        if active is not None:
+            yield active
+            return
+        data = await self._load(session_id)
+        turn = SessionTurn(session_id, data or self._new_session_data(session_id), is_new=data is None)
+        token = _CURRENT_TURN.set(turn)
+        try:
+            yield turn
+        finally:
+            _CURRENT_TURN.reset(token)
+            await self._flush(turn)
+
+    async def _flush(self, turn: SessionTurn) -> None:
+        if not turn.dirty:
+            # TTL was already refreshed when the turn loaded
+            return
+        # History appended during the turn goes out as RPUSH; it is only rewritten when replaced wholesale
+        replace_history = "conversation_history" in turn.dirty
+        fields = {k: turn.data.get(k) for k in turn.dirty if k != "conversation_history" or replace_history}
+        await self._write(turn.session_id, fields, new_messages=turn.new_messages, replace_history=replace_history)
+        turn.dirty.clear()
+        turn.new_messages.clear()
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        turn = self._active_turn(session_id)
+        if turn is not None:
+            # A snapshot, as a Redis read would give: later add_message calls must not show up in it
+            return copy.deepcopy(turn.data)
+        return await self._load(session_id)
 
     async def update_session(self, session_id: str, updates: Dict[str, Any]) -> None:
-        data = await self.get_session(session_id) or {}
-        # shallow merge for top-level; nested callers should handle deep merge as needed
-        data.update(updates)
-        data["last_active"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        await self.redis.setex(f"session:{session_id}", self.ttl, json.dumps(data))
+        turn = self._active_turn(session_id)
+        if turn is not None:
+            turn.update(updates)
+            return
+        # Field-level HSET: no read-modify-write, so concurrent writers to other fields are kept
+        await self._write(session_id, {**updates, "last_active": _now_iso()},
+                          replace_history="conversation_history" in updates)
 
     async def add_message(self, session_id: str, role: str, content: str) -> None:
-        data = await self.get_session(session_id) or {}
-        hist = data.get("conversation_history", [])
-        hist.append({"role": role, "content": content, "timestamp": time.time()})
-        # Trim to recent N
-        if len(hist) > self.max_history:
-            hist = hist[-self.max_history :]
-        data["conversation_history"] = hist
-        data["last_active"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        await self.redis.setex(f"session:{session_id}", self.ttl, json.dumps(data))
+        message = {"role": role, "content": content, "timestamp": time.time()}
+        turn = self._active_turn(session_id)
+        if turn is not None:
+            turn.append_message(message, self.max_history)
+            return
+        await self._write(session_id, {"last_active": _now_iso()}, new_messages=[message])
 
     async def get_conversation_context(self, session_id: str, n_messages: int = 10) -> List[Dict[str, str]]:
-        data = await self.get_session(session_id)
-        if not data:
+        turn = self._active_turn(session_id)
+        if turn is not None:
+            return (turn.data.get("conversation_history") or [])[-n_messages:]
+        if n_messages <= 0:
             return []
-        hist = data.get("conversation_history", [])
-        return hist[-n_messages:]
-
+        hist = await self.redis.lrange(self._history_key(session_id), -n_messages, -1)
+        if not hist:
+            data = await self._migrate_legacy(session_id)
+            return (data or {}).get("conversation_history", [])[-n_messages:]
+        return [json.loads(m) for m in hist]
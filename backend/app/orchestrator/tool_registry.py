@@ -5,6 +5,7 @@ import datetime as dt
 from typing import Any, Dict, List, Optional
 
 from app.services.db_service import DatabaseService
+from app.services.exceptions import DatabaseError, RecordNotFoundError
 from app.services.rag_service import VectorDBService
 from app.services.image_service import ImageService
 from app.orchestrator.session_manager import SessionManager
@@ -242,7 +243,10 @@ class ToolRegistry:
         if not query:
             return ToolResult.fail("query is required")
 
-        products = await self.db.search_products(query)
+        # Ranked in the database (pg_trgm/full-text), so misspellings still match
+        ranked = await self.db.search_products_ranked(query)
+        products = [p for p, _ in ranked]
+        scores = {p.product_id: score for p, score in ranked}
         if not products:
             # Heuristic fallback: treat queries like "vegetables"/"fruits"/"dairy"
             target_cat = _normalize_category_query(query)
@@ -254,10 +258,12 @@ class ToolRegistry:
 
         lines: List[str] = []
         data_out: List[Dict[str, Any]] = []
+        # One grouped query for the whole result set instead of one inventory load per product
+        availability = await self.db.get_availability_summary(p.product_id for p in products)
         for p in products:
-            inv_list = await self.db.get_available_inventory(p.product_id)
-            total_qty = sum(float(i.quantity_kg) for i in inv_list) if inv_list else 0.0
-            price = min((float(i.price_per_unit) for i in inv_list), default=None)
+            avail = availability.get(p.product_id) or {}
+            total_qty = avail.get("available_quantity_kg", 0.0)
+            price = avail.get("min_price_per_unit")
             if price is not None and total_qty > 0:
                 lines.append(f"{p.product_name}: {total_qty:.2f}kg available at {price:.2f} ETB/kg")
             else:
@@ -267,6 +273,7 @@ class ToolRegistry:
                 "product_name": p.product_name,
                 "available_quantity_kg": total_qty,
                 "min_price_per_unit": price,
+                "score": scores.get(p.product_id),
             })
 
         msg = f"Found {len(products)} products:\n" + "\n".join(lines)
@@ -349,16 +356,28 @@ class ToolRegistry:
                 # If DB not reachable, continue without a product filter
                 pass
 
-        # Narrow results: if we have a specific category or product, reduce n_results
-        n_results = 1 if category in {"storage", "nutrition", "selection", "seasonality"} and product_name else 3
-        result = self.rag.semantic_search(query, n_results=n_results, category=category, product_name=product_name)
-        documents = result.get("documents") or []
-        metadatas = result.get("metadatas") or []
-        scores = result.get("distances") or result.get("scores") or []
-        # Chroma returns list-of-lists
-        docs = documents[0] if documents and isinstance(documents[0], list) else documents
-        metas = metadatas[0] if metadatas and isinstance(metadatas[0], list) else metadatas
-        scs = scores[0] if scores and isinstance(scores[0], list) else scores
+        # Fully qualified question: answer from the exact (product, category) index, no embedding call
+        hit = None
+        if product_name and category:
+            try:
+                hit = await self.rag.async_lookup(product_name, category)
+            except Exception:
+                hit = None
+        if hit is not None:
+            docs, metas, scs = [hit["document"]], [hit["metadata"]], [0.0]
+        else:
+            # Narrow results: if we have a specific category or product, reduce n_results
+            n_results = 1 if category in {"storage", "nutrition", "selection", "seasonality"} and product_name else 3
+            result = await self.rag.async_semantic_search(
+                query, n_results=n_results, category=category, product_name=product_name
+            )
+            documents = result.get("documents") or []
+            metadatas = result.get("metadatas") or []
+            scores = result.get("distances") or result.get("scores") or []
+            # Chroma returns list-of-lists
+            docs = documents[0] if documents and isinstance(documents[0], list) else documents
+            metas = metadatas[0] if metadatas and isinstance(metadatas[0], list) else metadatas
+            scs = scores[0] if scores and isinstance(scores[0], list) else scores
 
         if not docs:
             return ToolResult.ok([], "I don't have specific information about that. Let me help you with something else.")
@@ -418,28 +437,25 @@ class ToolRegistry:
         if delivery_date < dt.date.today():
             return ToolResult.fail(f"Delivery date {delivery_date.isoformat()} is in the past. Please choose today or a future date.")
 
-        order_items: List[Dict[str, Any]] = []
-        total = 0.0
+        lines = []
         for it in items:
-            pname = str(it.get("product_name"))
-            qty = float(it.get("quantity_kg"))
-            product = await self.db.get_product_by_name(pname)
-            if not product:
-                return ToolResult.fail(f"Unknown product '{pname}'")
-            inv_list = await self.db.get_available_inventory(product.product_id)
-            price = min((float(i.price_per_unit) for i in inv_list), default=None)
-            if price is None:
-                return ToolResult.fail(f"No available inventory for '{pname}'")
-            total += qty * price
-            order_items.append({
-                "product_id": product.product_id,
-                "product_name": product.product_name,
-                "quantity_kg": qty,
-                "price_per_unit": price,
-            })
-
-        order_id = await self.db.create_order(customer_id, delivery_date, delivery_location, total)
-        await self.db.add_order_items(order_id, order_items)
+            name = str(it.get("product_name") or "").strip()
+            try:
+                qty = float(it.get("quantity_kg"))
+            except (TypeError, ValueError):
+                return ToolResult.fail(f"Please give the quantity in kg for {name or 'each item'}.")
+            if not qty > 0:
+                return ToolResult.fail(f"The quantity for {name or 'each item'} must be more than 0 kg.")
+            lines.append({"product_name": name, "quantity_kg": qty})
+
+        # Names resolved, stock locked and decremented, order and items written in one transaction
+        try:
+            placed = await self.db.place_order(customer_id, delivery_date, delivery_location, lines)
+        except (RecordNotFoundError, DatabaseError) as e:
+            return ToolResult.fail(str(e))
+        order_id = placed["order_id"]
+        total = placed["total"]
+        order_items = placed["items"]
 
         items_list = ", ".join([f"{it['quantity_kg']}kg {it['product_id']}" for it in order_items])
         msg = (
@@ -676,10 +692,15 @@ class ToolRegistry:
         except Exception:
             start_date = end_date = None
 
-        orders = await self.db.get_customer_orders(customer_id, status)
-        # Optional date filter on delivery_date if both dates present
-        if start_date and end_date:
-            orders = [o for o in orders if o.get("delivery_date") and start_date <= o["delivery_date"] <= end_date]
+        # Optional date filter on delivery_date if both dates present; filtering happens in SQL
+        if not (start_date and end_date):
+            start_date = end_date = None
+        # One extra row tells us whether older orders exist beyond the page shown
+        orders = await self.db.get_customer_orders(
+            customer_id, status, start_date, end_date, limit=_ORDERS_PAGE_SIZE + 1
+        )
+        has_more = len(orders) > _ORDERS_PAGE_SIZE
+        orders = orders[:_ORDERS_PAGE_SIZE]
 
         if not orders:
             return ToolResult.ok([], "You have no orders in the selected range.")
@@ -693,9 +714,15 @@ class ToolRegistry:
             items = o.get("items") or []
             items_txt = ", ".join([f"{it['quantity_kg']}kg {it['product_name']}" for it in items if it.get('product_name')])
             lines.append(f"- {when}: {st} — {total:.2f} ETB — {items_txt} to {loc}")
+        if has_more:
+            lines.append(f"Showing your {_ORDERS_PAGE_SIZE} most recent orders; narrow the date range or status to see others.")
         return ToolResult.ok(orders, "\n".join(lines))
 
 
+# Orders listed per get_customer_orders call
+_ORDERS_PAGE_SIZE = 20
+
+
 def _truncate(s: str, n: int = 300) -> str:
     return (s or "")[:n] + ("…" if s and len(s) > n else "")
 
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _Lane:
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.waiters = 0
+
+
+class TurnQueue:
+    """
+    Per-session ordered execution of conversation turns, with coalescing.
+
+    Turns for one session run strictly one at a time, in arrival order. Messages
+    that arrive while a turn is in flight wait; when the lane frees up, every
+    message queued by then is merged (newline-joined) into a single turn run by
+    the earliest waiter. The other submitters return None without running
+    anything. Sessions never block each other.
+
+    The lock is in-process: with several workers, sticky sessions are needed for
+    the ordering guarantee to hold.
+    """
+
+    def __init__(self, separator: str = "\n") -> None:
+        self.separator = separator
+        self._lanes: Dict[str, _Lane] = {}
+
+    async def submit(self, session_id: str, text: str,
+                     run: Callable[[str], Awaitable[T]]) -> Optional[T]:
+        """
+        Queue `text` for `session_id` and return `run(merged_text)` if this call ran the turn.
+
+        Returns None when the message was folded into a turn run by another submitter.
+        """
+        lane = self._lanes.setdefault(session_id, _Lane())
+        merged_into: asyncio.Future = asyncio.get_running_loop().create_future()
+        lane.pending.append((text, merged_into))
+        lane.waiters += 1
+        try:
+            async with lane.lock:
+                if merged_into.done():
+                    return None
+                batch, lane.pending = lane.pending, []
+                for _, fut in batch:
+                    if fut is not merged_into:
+                        fut.set_result(None)
+                return await run(self.separator.join(t for t, _ in batch))
+        finally:
+            lane.waiters -= 1
+            if lane.waiters == 0 and self._lanes.get(session_id) is lane:
+                del self._lanes[session_id]
+
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Unicode word characters, so Ethiopic names ("ሃበሻ") tokenize like Latin ones
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(str(text or "").casefold())
+
+
+def matches(meta: dict, where: Optional[dict]) -> bool:
+    """Evaluate the Chroma `where` subset VectorDBService builds ($eq, $and) against one metadata dict."""
+    if not where:
+        return True
+    for clause in where.get("$and", [where]):
+        for key, cond in clause.items():
+            value = cond.get("$eq") if isinstance(cond, dict) else cond
+            if meta.get(key) != value:
+                return False
+    return True
+
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal-rank fusion: sum of 1/(k + rank) over the rankings each id appears in, best first."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: -kv[1])
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of documents, with an inverted index so a query
+    only touches documents sharing a term with it. Rebuilt, not updated, when the
+    knowledge base changes.
+    """
+
+    def __init__(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict],
+                 k1: float = 1.5, b: float = 0.75) -> None:
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.k1 = k1
+        self.b = b
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for i, doc in enumerate(self.documents):
+            tf = Counter(tokenize(doc))
+            self._lengths.append(sum(tf.values()))
+            for term, count in tf.items():
+                self._postings[term].append((i, count))
+        n = len(self.documents)
+        self._avg_len = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, n_results: int, where: Optional[dict] = None) -> List[Tuple[int, float]]:
+        """(row, score) for the best `n_results` documents matching `where`, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for row, tf in self._postings[term]:
+                norm = 1 - self.b + self.b * self._lengths[row] / (self._avg_len or 1.0)
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        ranked = sorted(
+            ((row, s) for row, s in scores.items() if matches(self.metadatas[row], where)),
+            key=lambda rs: -rs[1],
+        )
+        return ranked[:n_results]
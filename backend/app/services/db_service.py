@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import asyncio
+import uuid
 from datetime import date, datetime, timedelta
-from decimal import Decimal
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
-from difflib import SequenceMatcher
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, func, update, and_, or_, text
+from sqlalchemy import select, func, update, insert, and_, or_, text, tuple_, literal, literal_column
 from sqlalchemy.orm import joinedload
 
 from app.config import settings
@@ -18,10 +18,13 @@ from app.models.orm import (
     Inventory,
     Order,
     OrderItem,
+    OrderItemAllocation,
     CompetitorPricing,
     TransactionHistory,
+    PricingDailyRollup,
 )
-from app.services.exceptions import DatabaseError, RecordNotFoundError
+from app.services.exceptions import DatabaseError, InsufficientInventoryError, RecordNotFoundError
+from app.services.product_catalog import ProductCatalog
 
 
 def _async_db_url() -> str:
@@ -46,9 +49,73 @@ SessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
 )
 
 
+# Market label used in competitor_pricing.source_market_type, keyed by result prefix
+_PRICING_MARKETS = (("farm", "Farm"), ("supermarket", "Supermarket"), ("distribution", "Distribution Center"))
+_PRICING_WINDOWS = (30, 90, 180, 365)
+
+
+# Lot order per allocation policy (settings.ALLOCATION_POLICY); inventory_id keeps it total
+_ALLOCATION_ORDER = {
+    "expiry": "expiry_date NULLS LAST, price_per_unit, inventory_id",
+    "cheapest": "price_per_unit, expiry_date NULLS LAST, inventory_id",
+}
+# Scale of the kg columns (DECIMAL(10,2))
+_KG = Decimal("0.01")
+# Skip-locked planning rounds before waiting on lots other orders hold
+_ALLOCATION_ATTEMPTS = 3
+
+# Allocates every order line across lots in one statement. Lines and lots are laid
+# end to end per product as cumulative kg ranges (window sums); a line takes the
+# overlap of its range with each lot's. Only the planned lots are then row-locked.
+_ALLOCATE_SQL = """
+WITH req AS (
+    SELECT line_no, product_id, qty,
+           SUM(qty) OVER w - qty AS req_lo,
+           SUM(qty) OVER w AS req_hi
+    FROM unnest(CAST(:line_nos AS int[]), CAST(:product_ids AS int[]), CAST(:qtys AS numeric[]))
+         AS r(line_no, product_id, qty)
+    WINDOW w AS (PARTITION BY product_id ORDER BY line_no)
+),
+stacked AS (
+    SELECT inventory_id, product_id,
+           SUM(quantity_kg) OVER w - quantity_kg AS lot_lo,
+           SUM(quantity_kg) OVER w AS lot_hi
+    FROM inventory
+    WHERE product_id = ANY(CAST(:product_ids AS int[]))
+      AND status = 'active'
+      AND available_date <= :today
+      AND (expiry_date IS NULL OR expiry_date >= :today)
+      AND quantity_kg > 0
+      AND inventory_id <> ALL(CAST(:exclude AS int[]))
+    WINDOW w AS (PARTITION BY product_id ORDER BY {order} ROWS UNBOUNDED PRECEDING)
+),
+plan AS (
+    SELECT r.line_no, s.inventory_id, s.lot_lo,
+           LEAST(s.lot_hi, r.req_hi) - GREATEST(s.lot_lo, r.req_lo) AS take_kg
+    FROM req r
+    JOIN stacked s ON s.product_id = r.product_id AND s.lot_lo < r.req_hi AND s.lot_hi > r.req_lo
+),
+locked AS (
+    SELECT inventory_id, quantity_kg, price_per_unit, status
+    FROM inventory
+    WHERE inventory_id IN (SELECT inventory_id FROM plan)
+    FOR UPDATE {lock}
+)
+SELECT p.line_no, p.inventory_id, p.take_kg, l.quantity_kg AS current_kg, l.price_per_unit, l.status
+FROM plan p
+LEFT JOIN locked l ON l.inventory_id = p.inventory_id
+ORDER BY p.line_no, p.lot_lo
+"""
+
+
+# Shared by every DatabaseService in the process
+_CATALOG = ProductCatalog(check_interval=settings.CATALOG_CHECK_SECONDS)
+
+
 class DatabaseService:
     def __init__(self):
         self._session_factory = SessionLocal
+        self.catalog = _CATALOG
 
     # ---------- User operations ----------
     async def create_user(self, phone: str, name: Optional[str], user_type: str, location: Optional[str]) -> str:
@@ -70,56 +137,110 @@ class DatabaseService:
             await session.commit()
 
     # ---------- Product operations ----------
-    async def get_all_products(self) -> List[Product]:
+    async def _catalog(self) -> ProductCatalog:
+        await self.catalog.refresh_if_stale(self._load_products, self._catalog_version)
+        return self.catalog
+
+    async def _load_products(self) -> List[Product]:
         async with self._session_factory() as session:
             res = await session.execute(select(Product).order_by(Product.product_name))
             return list(res.scalars().all())
 
-    async def get_product_by_name(self, name: str) -> Optional[Product]:
+    async def _catalog_version(self) -> Optional[int]:
+        # Bumped by a statement trigger on products (scripts/init_db.py)
         async with self._session_factory() as session:
-            # Case-insensitive equality using Python-lowered param
-            res = await session.execute(
-                select(Product).where(func.lower(Product.product_name) == name.lower())
-            )
+            res = await session.execute(text("SELECT version FROM catalog_version"))
             return res.scalar_one_or_none()
 
+    async def get_all_products(self) -> List[Product]:
+        return (await self._catalog()).all()
+
+    async def get_product_by_name(self, name: str) -> Optional[Product]:
+        # Case-insensitive equality against the in-memory catalog
+        return (await self._catalog()).get(name)
+
     async def fuzzy_get_product_by_name(self, name: str, threshold: float = 0.8) -> Tuple[Optional[Product], float]:
         """
         Find the most similar product by name using a simple ratio. Returns (Product|None, score).
-        Accepted when score >= threshold.
+        Accepted when score >= threshold. Only the catalog's trigram shortlist is scored.
         """
         target = (name or "").strip().lower()
         if not target:
             return None, 0.0
         try:
-            products = await self.get_all_products()
+            catalog = await self._catalog()
         except Exception:
             return None, 0.0
-        best: Optional[Product] = None
-        best_score: float = 0.0
-        for p in products:
-            cand = (p.product_name or "").strip().lower()
-            if not cand:
-                continue
-            score = SequenceMatcher(None, target, cand).ratio()
-            if score > best_score:
-                best = p
-                best_score = score
-        if best_score >= threshold:
-            return best, best_score
-        return None, best_score
+        return catalog.fuzzy(target, threshold)
 
     async def search_products(self, query: str) -> List[Product]:
+        return [p for p, _ in await self.search_products_ranked(query)]
+
+    async def search_products_ranked(self, query: str, limit: int = 50) -> List[Tuple[Product, float]]:
+        """
+        Products matching `query` by name or category, best first, as (Product, score).
+
+        In "trgm" mode the match and score come from pg_trgm similarity and the
+        products.search_tsv full-text column (GIN-indexed, see scripts/init_db.py), so
+        misspellings and partial names resolve in the database. Falls back to the
+        substring match (score 1.0) in "ilike" mode or when the extension/column is missing.
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        if settings.PRODUCT_SEARCH_MODE == "trgm":
+            try:
+                return await self._search_products_trgm(query, limit)
+            except Exception:
+                pass
+        return [(p, 1.0) for p in await self._search_products_ilike(query, limit)]
+
+    async def _search_products_trgm(self, query: str, limit: int) -> List[Tuple[Product, float]]:
+        q = literal(query)
+        tsq = func.plainto_tsquery("simple", q)
+        tsv = literal_column("products.search_tsv")
+        category = func.coalesce(Product.category, "")
+        score = func.greatest(
+            func.similarity(Product.product_name, q),
+            func.word_similarity(q, Product.product_name),
+            func.similarity(category, q),
+            func.ts_rank(tsv, tsq),
+        ).label("score")
+        pattern = f"%{query}%"
+        stmt = (
+            select(Product, score)
+            .where(
+                or_(
+                    Product.product_name.op("%")(q),
+                    q.op("<%")(Product.product_name),
+                    category.op("%")(q),
+                    tsv.op("@@")(tsq),
+                    # Keep plain substring hits the similarity threshold would drop
+                    Product.product_name.ilike(pattern),
+                    Product.category.ilike(pattern),
+                )
+            )
+            .order_by(score.desc(), Product.product_name)
+            .limit(limit)
+        )
+        async with self._session_factory() as session:
+            res = await session.execute(stmt)
+            return [(p, float(sc or 0.0)) for p, sc in res.all()]
+
+    async def _search_products_ilike(self, query: str, limit: int) -> List[Product]:
         async with self._session_factory() as session:
             pattern = f"%{query}%"
             # Support searching by product name OR category (e.g., "vegetables", "fruits", "dairy")
             res = await session.execute(
-                select(Product).where(
+                select(Product)
+                .where(
                     or_(
                         Product.product_name.ilike(pattern),
                         Product.category.ilike(pattern),
                     )
                 )
+                .order_by(Product.product_name)
+                .limit(limit)
             )
             return list(res.scalars().all())
 
@@ -166,6 +287,41 @@ class DatabaseService:
             )
             return list(res.scalars().all())
 
+    async def get_availability_summary(self, product_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Total available kg and lowest price per product, for many products in one grouped query.
+
+        Uses the same availability rule as `get_available_inventory` (active, available
+        today or earlier). Products without available stock are absent from the result.
+        """
+        ids = sorted({int(pid) for pid in product_ids})
+        if not ids:
+            return {}
+        today = date.today()
+        async with self._session_factory() as session:
+            res = await session.execute(
+                select(
+                    Inventory.product_id,
+                    func.sum(Inventory.quantity_kg).label("total_kg"),
+                    func.min(Inventory.price_per_unit).label("min_price"),
+                )
+                .where(
+                    and_(
+                        Inventory.product_id.in_(ids),
+                        Inventory.status == "active",
+                        Inventory.available_date <= today,
+                    )
+                )
+                .group_by(Inventory.product_id)
+            )
+            return {
+                int(r.product_id): {
+                    "available_quantity_kg": float(r.total_kg or 0),
+                    "min_price_per_unit": float(r.min_price) if r.min_price is not None else None,
+                }
+                for r in res.all()
+            }
+
     async def get_supplier_inventory(self, supplier_id: str) -> List[Dict[str, Any]]:
         async with self._session_factory() as session:
             res = await session.execute(
@@ -245,6 +401,38 @@ class DatabaseService:
             )
             await session.commit()
 
+    async def sweep_inventory(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Retire dead lots: active lots past their expiry date become 'expired' and active
+        lots with no quantity left become 'sold_out'.
+
+        Runs in batches of `batch_size` rows, each its own short transaction; rows locked
+        by in-flight orders are skipped and picked up by the next sweep. One pass per
+        condition, so the expiry pass can use the partial expiry index. Returns the
+        number of lots moved to each status.
+        """
+        moved = {"expired": 0, "sold_out": 0}
+        for status, dead in (("expired", "expiry_date < :today"), ("sold_out", "quantity_kg <= 0")):
+            sql = text(
+                f"""
+                UPDATE inventory SET status = :status
+                WHERE inventory_id IN (
+                    SELECT inventory_id FROM inventory
+                    WHERE status = 'active' AND {dead}
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                """
+            )
+            while True:
+                async with self._session_factory() as session:
+                    res = await session.execute(sql, {"status": status, "today": date.today(), "batch_size": batch_size})
+                    await session.commit()
+                moved[status] += res.rowcount
+                if res.rowcount < batch_size:
+                    break
+        return moved
+
     # ---------- Order operations ----------
     async def create_order(
         self,
@@ -306,42 +494,249 @@ class DatabaseService:
             )
             await session.commit()
 
-    async def get_customer_orders(self, customer_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def place_order(
+        self,
+        customer_id: str,
+        delivery_date: date,
+        delivery_location: str,
+        items: List[Dict[str, Any]],
+        policy: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Create an order and reserve its stock atomically.
+
+        `items` are {"product_name", "quantity_kg"}. In one transaction: resolve every
+        name in one query, fill each line from as many lots as it needs in the order of
+        `policy` (settings.ALLOCATION_POLICY: "expiry" or "cheapest") with a single
+        window-function query, lock just those lots (FOR UPDATE SKIP LOCKED, re-planning
+        around lots a concurrent order holds and only then waiting on them), decrement
+        them (marking emptied ones sold_out), and insert the order, its items and the
+        per-lot allocations. Raises DatabaseError for a missing or non-positive quantity,
+        RecordNotFoundError for an unknown product and InsufficientInventoryError when
+        stock is short; nothing is written in any of these cases.
+        """
+        lines = []
+        for it in items:
+            name = str(it.get("product_name") or "").strip()
+            try:
+                qty = Decimal(str(it.get("quantity_kg")))
+            except ArithmeticError:
+                qty = None
+            # Kept at the DECIMAL(10,2) scale of the kg columns, so no allocation rounds to 0.00;
+            # zero or negative lines would get no allocations and break settling
+            if qty is not None and qty.is_finite():
+                qty = qty.quantize(_KG, rounding=ROUND_HALF_UP)
+            if qty is None or not qty.is_finite() or qty < _KG:
+                raise DatabaseError(f"Quantity for '{name}' must be a positive number of kg (at least {_KG})")
+            lines.append((name, qty))
+        if not lines:
+            raise DatabaseError("Order has no items")
+        order_by = _ALLOCATION_ORDER.get(policy or settings.ALLOCATION_POLICY, _ALLOCATION_ORDER["expiry"])
+        today = date.today()
         async with self._session_factory() as session:
-            stmt = select(Order).where(Order.customer_id == customer_id)
-            if status:
-                stmt = stmt.where(Order.status == status)
-            res = await session.execute(stmt.order_by(Order.order_date.desc()))
-            orders = res.scalars().all()
+            async with session.begin():
+                res = await session.execute(
+                    select(Product).where(func.lower(Product.product_name).in_({n.lower() for n, _ in lines}))
+                )
+                by_lower = {p.product_name.lower(): p for p in res.scalars().all()}
+                resolved = []
+                for name, qty in lines:
+                    product = by_lower.get(name.lower())
+                    if product is None:
+                        raise RecordNotFoundError(f"Unknown product '{name}'")
+                    resolved.append((product, qty))
+
+                rows = await self._allocate(session, resolved, today, order_by)
+                order_items, lots, total = _settle_allocations(resolved, rows)
+
+                await session.execute(
+                    update(Inventory),
+                    [
+                        {"inventory_id": inv_id, "quantity_kg": left, "status": "active" if left > 0 else "sold_out"}
+                        for inv_id, left in lots.items()
+                    ],
+                )
+                res = await session.execute(
+                    text(
+                        """
+                        INSERT INTO orders (
+                            order_id, customer_id, delivery_date, delivery_location, total_amount, status
+                        ) VALUES (uuid_generate_v4(), :customer_id, :delivery_date, :delivery_location, :total_amount, 'pending')
+                        RETURNING order_id
+                        """
+                    ),
+                    {
+                        "customer_id": customer_id,
+                        "delivery_date": delivery_date,
+                        "delivery_location": delivery_location,
+                        "total_amount": total,
+                    },
+                )
+                order_id = res.scalar_one()
+                res = await session.execute(
+                    insert(OrderItem).returning(OrderItem.item_id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "order_id": order_id,
+                            "product_id": it["product_id"],
+                            "quantity_kg": it["quantity_kg"],
+                            "price_per_unit": it["price_per_unit"],
+                        }
+                        for it in order_items
+                    ],
+                )
+                item_ids = list(res.scalars().all())
+                await session.execute(
+                    insert(OrderItemAllocation),
+                    [
+                        {
+                            "item_id": item_ids[r.line_no],
+                            "inventory_id": r.inventory_id,
+                            "quantity_kg": r.take_kg,
+                            "price_per_unit": r.price_per_unit,
+                        }
+                        for r in rows
+                    ],
+                )
+        return {"order_id": str(order_id), "total": float(total), "items": order_items}
 
-            # Fetch items for each order
-            out: List[Dict[str, Any]] = []
-            for o in orders:
-                items_res = await session.execute(
-                    select(OrderItem, Product.product_name)
-                    .join(Product, Product.product_id == OrderItem.product_id)
-                    .where(OrderItem.order_id == o.order_id)
+    async def _allocate(self, session: AsyncSession, resolved: List[Tuple[Product, Decimal]], today: date,
+                        order_by: str) -> List[Any]:
+        """
+        Planned (line_no, inventory_id, take_kg) rows with every planned lot locked and
+        still holding what the plan takes from it.
+        """
+        params = {
+            "line_nos": list(range(len(resolved))),
+            "product_ids": [p.product_id for p, _ in resolved],
+            "qtys": [qty for _, qty in resolved],
+            "today": today,
+        }
+        exclude: set = set()
+        for attempt in range(_ALLOCATION_ATTEMPTS + 2):
+            # Skip-locked rounds first; then wait on the held lots (a fresh plan after each wait)
+            skip_locked = attempt < _ALLOCATION_ATTEMPTS
+            sql = _ALLOCATE_SQL.format(order=order_by, lock="SKIP LOCKED" if skip_locked else "")
+            res = await session.execute(text(sql), {**params, "exclude": sorted(exclude) if skip_locked else []})
+            rows = res.all()
+            skipped = {r.inventory_id for r in rows if r.current_kg is None}
+            if skipped:
+                exclude |= skipped
+                continue
+            taken: Dict[int, Decimal] = {}
+            for r in rows:
+                taken[r.inventory_id] = taken.get(r.inventory_id, Decimal("0")) + r.take_kg
+            if any(r.status != "active" or r.current_kg < taken[r.inventory_id] for r in rows):
+                # A lot changed after this statement's snapshot; plan again against fresh data
+                continue
+            covered = {i: Decimal("0") for i in range(len(resolved))}
+            for r in rows:
+                covered[r.line_no] += r.take_kg
+            short = next((i for i, (_, qty) in enumerate(resolved) if covered[i] < qty), None)
+            if short is None:
+                return rows
+            if not exclude or not skip_locked:
+                raise InsufficientInventoryError(
+                    f"Not enough available inventory for '{resolved[short][0].product_name}'"
                 )
-                items = [
+            # Short only because of lots held elsewhere: go straight to waiting on them
+            exclude.clear()
+        raise InsufficientInventoryError("Inventory is busy, please try again")
+
+    async def get_customer_orders(
+        self,
+        customer_id: str,
+        status: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Customer orders, newest first, with their items, in two queries (orders, then items IN).
+
+        Status and the delivery_date range are filtered in SQL. For keyset pagination pass
+        `limit` and, for later pages, `after=(order_date, order_id)` of the previous page's
+        last order (see `iter_customer_orders`). Orders without an order_date come first,
+        as in idx_orders_customer_date.
+        """
+        conds = [Order.customer_id == customer_id]
+        if status:
+            conds.append(Order.status == status)
+        if start_date:
+            conds.append(Order.delivery_date >= start_date)
+        if end_date:
+            conds.append(Order.delivery_date <= end_date)
+        if after is not None:
+            last_date, last_id = after
+            last_id = literal(uuid.UUID(str(last_id)), Order.order_id.type)
+            if last_date is None:
+                # Still inside the NULL-dated head: its remaining ids, then every dated order
+                conds.append(or_(and_(Order.order_date.is_(None), Order.order_id < last_id),
+                                 Order.order_date.is_not(None)))
+            else:
+                # A NULL order_date compares as NULL here, and those rows were already paged
+                conds.append(tuple_(Order.order_date, Order.order_id)
+                             < tuple_(literal(last_date, Order.order_date.type), last_id))
+        stmt = (
+            select(Order)
+            .where(and_(*conds))
+            .order_by(Order.order_date.desc().nulls_first(), Order.order_id.desc())
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+
+        async with self._session_factory() as session:
+            orders = (await session.execute(stmt)).scalars().all()
+            if not orders:
+                return []
+            items_res = await session.execute(
+                select(OrderItem, Product.product_name)
+                .join(Product, Product.product_id == OrderItem.product_id)
+                .where(OrderItem.order_id.in_([o.order_id for o in orders]))
+                .order_by(OrderItem.item_id)
+            )
+            items_by_order: Dict[Any, List[Dict[str, Any]]] = {}
+            for it in items_res.all():
+                items_by_order.setdefault(it.OrderItem.order_id, []).append(
                     {
                         "product_id": it.OrderItem.product_id,
                         "product_name": it.product_name,
                         "quantity_kg": float(it.OrderItem.quantity_kg),
                         "price_per_unit": float(it.OrderItem.price_per_unit),
                     }
-                    for it in items_res.all()
-                ]
-                out.append(
-                    {
-                        "order_id": str(o.order_id),
-                        "delivery_date": o.delivery_date,
-                        "delivery_location": o.delivery_location,
-                        "total_amount": float(o.total_amount),
-                        "status": o.status,
-                        "items": items,
-                    }
                 )
-            return out
+            return [
+                {
+                    "order_id": str(o.order_id),
+                    "order_date": o.order_date,
+                    "delivery_date": o.delivery_date,
+                    "delivery_location": o.delivery_location,
+                    "total_amount": float(o.total_amount),
+                    "status": o.status,
+                    "items": items_by_order.get(o.order_id, []),
+                }
+                for o in orders
+            ]
+
+    async def iter_customer_orders(
+        self,
+        customer_id: str,
+        status: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        page_size: int = 50,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield a customer's orders page by page (keyset on order_date, order_id)."""
+        after: Optional[Tuple[datetime, str]] = None
+        while True:
+            page = await self.get_customer_orders(customer_id, status, start_date, end_date, limit=page_size, after=after)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            after = (page[-1]["order_date"], page[-1]["order_id"])
 
     async def get_supplier_pending_orders(self, supplier_id: str) -> List[Dict[str, Any]]:
         async with self._session_factory() as session:
@@ -458,34 +853,168 @@ class DatabaseService:
             return float(avg_val) if avg_val is not None else None
 
     async def calculate_pricing_recommendation(self, product_id: int) -> Dict[str, Any]:
-        async def _avg_with_fallback(market: str) -> Optional[float]:
-            # Try recent windows, then all-time
-            for days in (30, 90, 180, 365):
-                val = await self.get_average_competitor_price(product_id, market, days_back=days)
-                if val is not None:
-                    return val
-            return await self.get_average_competitor_price_anytime(product_id, market)
-
-        farm = await _avg_with_fallback("Farm")
-        supermarket = await _avg_with_fallback("Supermarket")
-        distribution = await _avg_with_fallback("Distribution Center")
-        historical = await self.get_historical_transaction_prices(product_id)
-
-        # Simple rule: Farm avg + 10% as baseline
-        base = farm if farm is not None else historical if historical is not None else 0.0
-        recommended = round(base * 1.10, 2) if base else None
-
-        # Get product name
+        recs = await self.calculate_pricing_recommendations([product_id])
+        return recs[int(product_id)]
+
+    async def calculate_pricing_recommendations(self, product_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Pricing recommendations for many products in a single round trip.
+
+        Every market's 30/90/180/365-day and all-time averages are computed in one pass
+        with FILTER clauses; the first non-empty window wins, as before. The 60-day
+        transaction average and product names join in the same statement. Unknown ids
+        get an empty recommendation (name None, recommended 0.0).
+
+        With PRICING_USE_ROLLUP (default) averages come from pricing_daily_rollup, so the
+        cost depends on the number of days in the windows rather than on raw row counts;
+        the transaction window is then whole days instead of a rolling timestamp.
+        """
+        ids = sorted({int(pid) for pid in product_ids})
+        if not ids:
+            return {}
+        if settings.PRICING_USE_ROLLUP:
+            cp, th = _rollup_pricing_sources(ids, date.today())
+        else:
+            cp, th = _raw_pricing_sources(ids, date.today())
+        stmt = (
+            select(Product.product_id, Product.product_name,
+                   *(c for c in cp.c if c.name != "product_id"), th.c.historical)
+            .outerjoin(cp, cp.c.product_id == Product.product_id)
+            .outerjoin(th, th.c.product_id == Product.product_id)
+            .where(Product.product_id.in_(ids))
+        )
         async with self._session_factory() as session:
-            res = await session.execute(select(Product.product_name).where(Product.product_id == product_id))
-            name = res.scalar_one_or_none()
-
-        return {
-            "product_id": product_id,
-            "product_name": name,
-            "recommended": recommended if recommended is not None else 0.0,
-            "farm_avg": farm,
-            "supermarket_avg": supermarket,
-            "distribution_avg": distribution,
-            "historical_avg": historical,
-        }
+            rows = (await session.execute(stmt)).mappings().all()
+
+        out = {pid: _pricing_result(pid, None, {}, None) for pid in ids}
+        for r in rows:
+            avgs: Dict[str, Optional[float]] = {}
+            for key, _ in _PRICING_MARKETS:
+                # Try recent windows, then all-time
+                windows = [r[f"{key}_{days}"] for days in _PRICING_WINDOWS] + [r[f"{key}_all"]]
+                val = next((v for v in windows if v is not None), None)
+                avgs[key] = float(val) if val is not None else None
+            historical = float(r["historical"]) if r["historical"] is not None else None
+            pid = int(r["product_id"])
+            out[pid] = _pricing_result(pid, r["product_name"], avgs, historical)
+        return out
+
+
+def _settle_allocations(resolved: List[Tuple[Product, Decimal]], rows: List[Any]):
+    """Order items (with per-lot allocations), remaining kg per lot and the order total."""
+    cents = Decimal("0.01")
+    costs: Dict[int, Decimal] = {}
+    allocs: Dict[int, List[Dict[str, Any]]] = {}
+    lots: Dict[int, Decimal] = {}
+    for r in rows:
+        costs[r.line_no] = costs.get(r.line_no, Decimal("0")) + r.take_kg * r.price_per_unit
+        allocs.setdefault(r.line_no, []).append({
+            "inventory_id": r.inventory_id,
+            "quantity_kg": float(r.take_kg),
+            "price_per_unit": float(r.price_per_unit),
+        })
+        lots[r.inventory_id] = lots.get(r.inventory_id, r.current_kg) - r.take_kg
+    order_items: List[Dict[str, Any]] = []
+    total = Decimal("0")
+    for line_no, (product, qty) in enumerate(resolved):
+        cost = costs[line_no]
+        total += cost
+        order_items.append({
+            "product_id": product.product_id,
+            "product_name": product.product_name,
+            "quantity_kg": float(qty),
+            # Quantity-weighted across the lots the line was filled from
+            "price_per_unit": float((cost / qty).quantize(cents)),
+            "allocations": allocs[line_no],
+        })
+    return order_items, lots, total.quantize(cents)
+
+
+def _pricing_result(product_id: int, name: Optional[str], avgs: Dict[str, Optional[float]],
+                    historical: Optional[float]) -> Dict[str, Any]:
+    farm = avgs.get("farm")
+    # Simple rule: Farm avg + 10% as baseline
+    base = farm if farm is not None else historical if historical is not None else 0.0
+    recommended = round(base * 1.10, 2) if base else None
+    return {
+        "product_id": product_id,
+        "product_name": name,
+        "recommended": recommended if recommended is not None else 0.0,
+        "farm_avg": farm,
+        "supermarket_avg": avgs.get("supermarket"),
+        "distribution_avg": avgs.get("distribution"),
+        "historical_avg": historical,
+    }
+
+
+def _raw_pricing_sources(ids: List[int], today: date):
+    """Windowed averages straight from competitor_pricing / transaction_history."""
+    cp_cols = []
+    for key, market in _PRICING_MARKETS:
+        in_market = CompetitorPricing.source_market_type == market
+        for days in _PRICING_WINDOWS:
+            start = today - timedelta(days=days)
+            cp_cols.append(
+                func.avg(CompetitorPricing.price)
+                .filter(and_(in_market, CompetitorPricing.date >= start))
+                .label(f"{key}_{days}")
+            )
+        cp_cols.append(func.avg(CompetitorPricing.price).filter(in_market).label(f"{key}_all"))
+    cp = (
+        select(CompetitorPricing.product_id.label("product_id"), *cp_cols)
+        .where(CompetitorPricing.product_id.in_(ids))
+        .group_by(CompetitorPricing.product_id)
+        .subquery()
+    )
+    th = (
+        select(
+            TransactionHistory.product_id.label("product_id"),
+            func.avg(TransactionHistory.price_per_unit).label("historical"),
+        )
+        .where(
+            and_(
+                TransactionHistory.product_id.in_(ids),
+                TransactionHistory.order_date >= datetime.utcnow() - timedelta(days=60),
+            )
+        )
+        .group_by(TransactionHistory.product_id)
+        .subquery()
+    )
+    return cp, th
+
+
+def _rollup_pricing_sources(ids: List[int], today: date):
+    """Same columns as `_raw_pricing_sources`, as sum/count over pricing_daily_rollup days."""
+    R = PricingDailyRollup
+
+    def _avg(cond):
+        return func.sum(R.price_sum).filter(cond) / func.sum(R.n).filter(cond)
+
+    cp_cols = []
+    for key, market in _PRICING_MARKETS:
+        in_market = R.market == market
+        for days in _PRICING_WINDOWS:
+            cp_cols.append(_avg(and_(in_market, R.day >= today - timedelta(days=days))).label(f"{key}_{days}"))
+        cp_cols.append(_avg(in_market).label(f"{key}_all"))
+    cp = (
+        select(R.product_id.label("product_id"), *cp_cols)
+        .where(and_(R.product_id.in_(ids), R.source == "competitor"))
+        .group_by(R.product_id)
+        .subquery()
+    )
+    th = (
+        select(
+            R.product_id.label("product_id"),
+            (func.sum(R.price_sum) / func.sum(R.n)).label("historical"),
+        )
+        .where(
+            and_(
+                R.product_id.in_(ids),
+                R.source == "transaction",
+                R.day >= today - timedelta(days=60),
+            )
+        )
+        .group_by(R.product_id)
+        .subquery()
+    )
+    return cp, th
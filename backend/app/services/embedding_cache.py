@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import settings
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of an embedding: model name and exact text."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by `cache_key(model, text)`.
+
+    An in-process LRU (`max_entries` vectors) sits in front of an optional Redis
+    tier shared by all workers and restarts (`emb:<key>` holding raw float64 bytes,
+    expiring after `ttl` seconds; Redis' maxmemory policy bounds it). Redis errors
+    are logged and treated as misses, so the cache never fails an embedding call.
+    `stats` counts memory hits, Redis hits and misses.
+    """
+
+    def __init__(self, max_entries: int = 4096, redis_client: Any = None, ttl: int = 30 * 86400) -> None:
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+    @classmethod
+    def from_settings(cls) -> Optional["EmbeddingCache"]:
+        mode = settings.EMBED_CACHE
+        if mode == "off":
+            return None
+        client = None
+        if mode == "redis":
+            import redis
+
+            # Sync client: embeddings are computed on worker threads
+            client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return cls(max_entries=settings.EMBED_CACHE_SIZE, redis_client=client, ttl=settings.EMBED_CACHE_TTL)
+
+    # ---------- Memory tier ----------
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _recall(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += n
+
+    # ---------- API ----------
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector per text, None where missing."""
+        keys = [cache_key(model, t) for t in texts]
+        out: List[Optional[List[float]]] = [self._recall(k) for k in keys]
+        self._count("memory_hits", sum(v is not None for v in out))
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing and self.redis is not None:
+            try:
+                raw = self.redis.mget([f"emb:{keys[i]}" for i in missing])
+            except Exception as e:
+                logging.getLogger(__name__).debug("Embedding cache read failed: %s", e)
+                self._count("redis_errors")
+                raw = [None] * len(missing)
+            for i, blob in zip(missing, raw):
+                if blob:
+                    vector = array("d", blob).tolist()
+                    out[i] = vector
+                    self._remember(keys[i], vector)
+                    self._count("redis_hits")
+        self._count("misses", sum(v is None for v in out))
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        keys = [cache_key(model, t) for t in texts]
+        for key, vector in zip(keys, vectors):
+            self._remember(key, list(vector))
+        if self.redis is None or not keys:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, vector in zip(keys, vectors):
+                pipe.set(f"emb:{key}", array("d", vector).tobytes(), ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logging.getLogger(__name__).debug("Embedding cache write failed: %s", e)
+            self._count("redis_errors")
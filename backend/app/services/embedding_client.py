@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EmbeddingClient:
+    """
+    Batched text embeddings over the AI Studio REST API (API key auth).
+
+    Texts are sent `batch_size` at a time to `batchEmbedContents` through one pooled
+    HTTP session, with up to `concurrency` batches in flight. 429 and 5xx responses
+    and connection errors are retried with jittered exponential backoff (honouring
+    Retry-After); other errors raise RuntimeError. Output order matches input order.
+
+    With a `cache` (EmbeddingCache), only texts it has not seen are sent, each once.
+    """
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 model: str = "text-embedding-004",
+                 batch_size: Optional[int] = None,
+                 concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None,
+                 timeout: float = 30.0,
+                 session: Optional[requests.Session] = None,
+                 cache: Optional[EmbeddingCache] = None) -> None:
+        self._api_key = api_key
+        self.base_url = (base_url or settings.EMBED_API_BASE).rstrip("/")
+        self.model = model
+        self.batch_size = max(1, min(batch_size or settings.EMBED_BATCH_SIZE, 100))
+        self.concurrency = max(1, concurrency or settings.EMBED_CONCURRENCY)
+        self.max_retries = settings.EMBED_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout
+        self._session = session
+        self.cache = cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # ---------- Transport ----------
+    def _http(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+        return self._executor
+
+    def _key(self) -> str:
+        key = self._api_key or os.getenv("GOOGLE_API_KEY") or settings.GEMINI_API_KEY
+        if not key:
+            raise RuntimeError("GOOGLE_API_KEY/GEMINI_API_KEY not set for embeddings")
+        return key
+
+    def _post_batch(self, texts: List[str]) -> List[List[float]]:
+        url = f"{self.base_url}/models/{self.model}:batchEmbedContents"
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self._key()}
+        payload = {
+            "requests": [
+                {"model": f"models/{self.model}", "content": {"parts": [{"text": str(t)}]}} for t in texts
+            ]
+        }
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                resp = self._http().post(url, json=payload, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error: Any = e
+            else:
+                if resp.status_code == 200:
+                    return _parse_batch(resp.json(), len(texts))
+                if resp.status_code not in _RETRY_STATUSES:
+                    raise RuntimeError(f"Embedding HTTP {resp.status_code}: {resp.text[:200]}")
+                error = f"HTTP {resp.status_code}"
+                try:
+                    retry_after = float(resp.headers.get("Retry-After", ""))
+                except ValueError:
+                    retry_after = None
+            if attempt >= self.max_retries:
+                raise RuntimeError(f"Embedding failed after {attempt + 1} attempts: {error}")
+            delay = retry_after if retry_after is not None else min(0.5 * 2 ** attempt, 8.0) * random.uniform(0.5, 1.0)
+            logging.getLogger(__name__).warning(
+                "Embedding batch of %d failed (%s), retry %d/%d in %.2fs", len(texts), error, attempt + 1,
+                self.max_retries, delay,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    # ---------- API ----------
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed_uncached(texts)
+        texts = [str(t) for t in texts]
+        found = self.cache.get_many(self.model, texts)
+        todo = list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+        if todo:
+            fresh = dict(zip(todo, self._embed_uncached(todo)))
+            self.cache.put_many(self.model, todo, [fresh[t] for t in todo])
+            found = [v if v is not None else fresh[t] for t, v in zip(texts, found)]
+        return found
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            # A single query: no thread hop
+            return self._post_batch(batches[0])
+        vectors: List[List[float]] = []
+        for chunk in self._pool().map(self._post_batch, batches):
+            vectors.extend(chunk)
+        return vectors
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def _parse_batch(data: dict, expected: int) -> List[List[float]]:
+    embeddings = data.get("embeddings") or []
+    if len(embeddings) != expected:
+        raise RuntimeError(f"Embedding response has {len(embeddings)} vectors for {expected} texts")
+    vectors = []
+    for emb in embeddings:
+        values = (emb or {}).get("values")
+        if not values:
+            raise RuntimeError("Embedding response missing values")
+        vectors.append(values)
+    return vectors
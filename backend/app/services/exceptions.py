@@ -5,3 +5,11 @@ class DatabaseError(Exception):
 class RecordNotFoundError(Exception):
     pass
 
+
+class InsufficientInventoryError(DatabaseError):
+    pass
+
+
+
+class LLMTimeoutError(Exception):
+    pass
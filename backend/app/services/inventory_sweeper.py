@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+
+class InventorySweeper:
+    """
+    Periodic background task that retires dead inventory lots.
+
+    Every `interval` seconds calls `db.sweep_inventory(batch_size)`, which moves
+    expired lots to 'expired' and empty ones to 'sold_out' so the active set (and
+    the partial indexes over it) only holds sellable stock. Failures are logged and
+    retried on the next tick. Running it in several workers is safe: batches lock
+    with SKIP LOCKED, so concurrent sweeps just split the work.
+    """
+
+    def __init__(self, db, interval: float = 300.0, batch_size: int = 1000) -> None:
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        moved = await self.db.sweep_inventory(batch_size=self.batch_size)
+        if any(moved.values()):
+            logging.getLogger(__name__).info(
+                "Inventory sweep: %d expired, %d sold out", moved["expired"], moved["sold_out"]
+            )
+        return moved
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.getLogger(__name__).warning("Inventory sweep failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Any, Dict, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
 import google.generativeai as genai
 
 from app.config import settings
 from app.prompts.system_prompt import SYSTEM_PROMPT
+from app.services.exceptions import LLMTimeoutError
 
 
 def _schema(type_: str, properties: Dict[str, Any] | None = None, required: List[str] | None = None, items: Dict[str, Any] | None = None) -> Dict[str, Any]:
@@ -197,6 +203,67 @@ def _wrap_tools(function_decls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return [{"function_declarations": function_decls}]
 
 
+_TOOL_DECLS: List[Dict[str, Any]] | None = None
+
+
+def tool_declarations() -> List[Dict[str, Any]]:
+    """Process-wide tool declarations, built once. Treat the result as read-only."""
+    global _TOOL_DECLS
+    if _TOOL_DECLS is None:
+        _TOOL_DECLS = _tool_declarations()
+    return _TOOL_DECLS
+
+
+def _stable_hash(obj: Any) -> str:
+    raw = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _ModelRegistry:
+    """
+    Cache of GenerativeModel instances keyed by (model name, tool set, generation config).
+
+    Each combination is constructed (and validated by the SDK) once. Tool lists are
+    hashed by content, and the hash is memoized per list object so repeated calls
+    with the same declarations skip re-serialization.
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[str, Any] = {}
+        # id(tools) -> (tools, hash); holding the list keeps its id from being reused
+        self._tool_hashes: Dict[int, Tuple[List[Dict[str, Any]], str]] = {}
+        self._lock = threading.Lock()
+
+    def _tools_hash(self, tools: List[Dict[str, Any]] | None) -> str | None:
+        if tools is None:
+            return None
+        hit = self._tool_hashes.get(id(tools))
+        if hit is not None and hit[0] is tools:
+            return hit[1]
+        h = _stable_hash(tools)
+        self._tool_hashes[id(tools)] = (tools, h)
+        return h
+
+    def get(self, model_name: str, tools: List[Dict[str, Any]] | None, generation_config: Dict[str, Any]) -> Any:
+        with self._lock:
+            key = _stable_hash([model_name, self._tools_hash(tools), generation_config])
+            model = self._models.get(key)
+            if model is None:
+                kwargs: Dict[str, Any] = {"generation_config": generation_config}
+                if tools is not None:
+                    kwargs["tools"] = _wrap_tools(tools)
+                model = genai.GenerativeModel(model_name, **kwargs)
+                self._models[key] = model
+                logging.getLogger(__name__).debug("LLM model built key=%s total=%d", key[:8], len(self._models))
+            return model
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+_MODELS = _ModelRegistry()
+
+
 class LLMService:
     def __init__(self):
         genai.configure(api_key=settings.GEMINI_API_KEY)
@@ -206,12 +273,14 @@ class LLMService:
             "top_k": 40,
             "max_output_tokens": 2048,
         }
+        self.model_name = "gemini-2.5-pro"
         # Default model with tools enabled for tool-calling phases
-        self.model = genai.GenerativeModel(
-            "gemini-2.5-pro",
-            tools=_wrap_tools(_tool_declarations()),
-            generation_config=self._gen_config,
+        self.model = _MODELS.get(self.model_name, tool_declarations(), self._gen_config)
+        # Dedicated pool for blocking SDK calls; bounds concurrent Gemini requests per worker
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(settings.LLM_MAX_CONCURRENCY)), thread_name_prefix="llm"
         )
+        self._timeout = float(settings.LLM_TIMEOUT_SECONDS)
 
     def _build_system_prompt(self, user_type: str, registered: bool, user_name: str, context_summary: str, tool_descriptions: str) -> str:
         return SYSTEM_PROMPT.format(
@@ -222,30 +291,21 @@ class LLMService:
             tool_descriptions=tool_descriptions,
         )
 
+    def _select_model(self, tools: List[Dict[str, Any]] | None, allow_tools: bool):
+        if allow_tools:
+            return self.model if tools is None else _MODELS.get(self.model_name, tools, self._gen_config)
+        # Finalization model without tools to avoid unintended tool calls or refusals
+        return _MODELS.get(self.model_name, None, self._gen_config)
+
     def chat(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]] | None = None, allow_tools: bool = True) -> Dict[str, Any]:
         """
         Call Gemini with conversation messages and optional tool declarations.
 
         Returns dict with either:
         - {"type": "text", "content": str}
-        - {"type": "tool_call", "name": str, "arguments": dict}
+        - {"type": "tool_call", "name": str, "arguments": dict, "calls": [{"name", "arguments"}, ...]}
         """
-        if allow_tools:
-            model = self.model if tools is None else genai.GenerativeModel(
-                "gemini-2.5-pro", tools=_wrap_tools(tools), generation_config=self._gen_config
-            )
-        else:
-            # Finalization model without tools to avoid unintended tool calls or refusals
-            model = genai.GenerativeModel("gemini-2.5-pro", generation_config=self._gen_config)
-
-        # Convert our {role, content} messages into SDK-friendly contents
-        def _coerce_messages(msgs: List[Dict[str, str]]):
-            out = []
-            for m in msgs:
-                role = m.get("role", "user")
-                content = m.get("content", "")
-                out.append({"role": role, "parts": [content]})
-            return out
+        model = self._select_model(tools, allow_tools)
 
         logger = logging.getLogger(__name__)
         try:
@@ -253,55 +313,180 @@ class LLMService:
         except Exception:
             pass
         resp = model.generate_content(_coerce_messages(messages))
+        return _parse_response(resp)
+
+    async def achat(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]] | None = None, allow_tools: bool = True) -> Dict[str, Any]:
+        """
+        Async variant of `chat` for use on the event loop.
 
-        # Parse function/tool call if present
+        The blocking SDK call runs on a dedicated, bounded thread pool so one slow
+        Gemini request does not stall other sessions in the same worker. Raises
+        `LLMTimeoutError` when the call exceeds `LLM_TIMEOUT_SECONDS`.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._executor, lambda: self.chat(messages, tools=tools, allow_tools=allow_tools))
         try:
-            # The SDK surfaces function calls in candidates' content parts
-            cand = resp.candidates[0]
-            for part in cand.content.parts:
-                # FunctionCall types may be exposed as dict-like
-                if hasattr(part, "function_call") and part.function_call:
-                    fc = part.function_call
-                    out = {
-                        "type": "tool_call",
-                        "name": getattr(fc, "name", None) or fc.get("name"),
-                        "arguments": getattr(fc, "args", None) or fc.get("args", {}),
-                    }
-                    try:
-                        logger.info("LLM.tool_call name=%s", out.get("name"))
-                    except Exception:
-                        pass
-                    return out
+            return await asyncio.wait_for(fut, timeout=self._timeout)
+        except asyncio.TimeoutError as e:
+            # The worker thread finishes in the background; its result is discarded.
+            logging.getLogger(__name__).warning("LLM.achat timed out after %.1fs", self._timeout)
+            raise LLMTimeoutError(f"LLM call exceeded {self._timeout:.0f}s") from e
+
+    async def astream(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]] | None = None, allow_tools: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of `achat` using Gemini's streaming API.
+
+        Yields {"type": "delta", "content": str} for each text chunk as it arrives,
+        followed by exactly one final result shaped like `chat`'s return value.
+        Tool calls are only reported in the final result. The overall call is
+        bounded by `LLM_TIMEOUT_SECONDS` like `achat`.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        model = self._select_model(tools, allow_tools)
+
+        def _put(item: Tuple[str, Any]) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Event loop already closed; nobody is listening anymore
+                stop.set()
+
+        def _produce() -> None:
+            try:
+                resp = model.generate_content(_coerce_messages(messages), stream=True)
+                for chunk in resp:
+                    if stop.is_set():
+                        return
+                    _put(("chunk", chunk))
+                _put(("end", None))
+            except Exception as e:  # surface SDK errors on the event loop
+                _put(("error", e))
+
+        logger = logging.getLogger(__name__)
+        try:
+            logger.debug("LLM.astream start messages=%d tools=%s", len(messages), bool(tools))
         except Exception:
             pass
+        self._executor.submit(_produce)
+        deadline = loop.time() + self._timeout
+        pieces: List[str] = []
+        calls: List[Dict[str, Any]] = []
+        try:
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError as e:
+                    logger.warning("LLM.astream timed out after %.1fs", self._timeout)
+                    raise LLMTimeoutError(f"LLM call exceeded {self._timeout:.0f}s") from e
+                if kind == "error":
+                    raise payload
+                if kind == "end":
+                    break
+                calls.extend(_function_calls(payload))
+                for t in _text_parts(payload):
+                    pieces.append(t)
+                    yield {"type": "delta", "content": t}
+        finally:
+            stop.set()
 
-        # Fallback to text (robust against multi-part responses)
-        def _safe_text(r) -> str:
-            try:
-                # Avoid resp.text because it raises for multi-part responses
-                pieces: List[str] = []
-                for cand in getattr(r, "candidates", []) or []:
-                    content = getattr(cand, "content", None)
-                    parts = getattr(content, "parts", []) if content else []
-                    for part in parts:
-                        # part.text is typical for plain text parts
-                        t = getattr(part, "text", None)
-                        if t:
-                            pieces.append(t)
-                        else:
-                            # Some SDK variants expose dict-like parts
-                            if isinstance(part, dict):
-                                v = part.get("text") or part.get("content")
-                                if isinstance(v, str):
-                                    pieces.append(v)
-                return "\n".join(pieces).strip()
-            except Exception:
-                return ""
-
-        text = _safe_text(resp)
-        out = {"type": "text", "content": text or ""}
+        if calls:
+            yield _tool_call_result(calls)
+            return
+        text = "".join(pieces).strip()
         try:
-            logger.debug("LLM.text len=%d", len(out["content"]) if out["content"] else 0)
+            logger.debug("LLM.astream text len=%d", len(text))
         except Exception:
             pass
-        return out
+        yield {"type": "text", "content": text}
+
+
+def _coerce_messages(msgs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Convert our {role, content} messages into SDK-friendly contents."""
+    out = []
+    for m in msgs:
+        role = m.get("role", "user")
+        content = m.get("content", "")
+        out.append({"role": role, "parts": [content]})
+    return out
+
+
+def _function_calls(resp: Any) -> List[Dict[str, Any]]:
+    """Return every function call in the first candidate of a response (or stream chunk)."""
+    calls: List[Dict[str, Any]] = []
+    try:
+        # The SDK surfaces function calls in candidates' content parts
+        cand = resp.candidates[0]
+        for part in cand.content.parts:
+            # FunctionCall types may be exposed as dict-like
+            if hasattr(part, "function_call") and part.function_call:
+                fc = part.function_call
+                calls.append({
+                    "name": getattr(fc, "name", None) or fc.get("name"),
+                    "arguments": getattr(fc, "args", None) or fc.get("args", {}),
+                })
+    except Exception:
+        pass
+    return calls
+
+
+def _tool_call_result(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Shape one or more function calls as a chat() result.
+
+    `name`/`arguments` mirror the first call for single-call callers; `calls`
+    lists every call the model made in this turn, in order.
+    """
+    try:
+        logging.getLogger(__name__).info("LLM.tool_call names=%s", ",".join(str(c.get("name")) for c in calls))
+    except Exception:
+        pass
+    first = calls[0]
+    return {"type": "tool_call", "name": first["name"], "arguments": first["arguments"], "calls": calls}
+
+
+def _parse_response(resp: Any) -> Dict[str, Any]:
+    logger = logging.getLogger(__name__)
+
+    # Parse function/tool calls if present
+    calls = _function_calls(resp)
+    if calls:
+        return _tool_call_result(calls)
+
+    text = _safe_text(resp)
+    out = {"type": "text", "content": text or ""}
+    try:
+        logger.debug("LLM.text len=%d", len(out["content"]) if out["content"] else 0)
+    except Exception:
+        pass
+    return out
+
+
+def _text_parts(r: Any) -> List[str]:
+    """Raw text parts of a response or stream chunk, unmodified (whitespace preserved)."""
+    pieces: List[str] = []
+    try:
+        # Avoid resp.text because it raises for multi-part responses
+        for cand in getattr(r, "candidates", []) or []:
+            content = getattr(cand, "content", None)
+            parts = getattr(content, "parts", []) if content else []
+            for part in parts:
+                # part.text is typical for plain text parts
+                t = getattr(part, "text", None)
+                if t:
+                    pieces.append(t)
+                else:
+                    # Some SDK variants expose dict-like parts
+                    if isinstance(part, dict):
+                        v = part.get("text") or part.get("content")
+                        if isinstance(v, str):
+                            pieces.append(v)
+    except Exception:
+        return []
+    return pieces
+
+
+def _safe_text(r: Any) -> str:
+    """Fallback to text (robust against multi-part responses)."""
+    return "\n".join(_text_parts(r)).strip()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+def _trigrams(text: str) -> Set[str]:
+    # Padded like pg_trgm so short names and word starts still share grams
+    s = f"  {' '.join(text.lower().split())} "
+    return {s[i : i + 3] for i in range(len(s) - 2)}
+
+
+class ProductCatalog:
+    """
+    Process-local snapshot of the products table with lookup indexes.
+
+    Holds exact and lowercase name maps plus a character-trigram inverted index used
+    to shortlist fuzzy candidates; only the shortlist is scored with SequenceMatcher,
+    so resolution stays in memory and sub-linear in catalog size.
+
+    Staleness is checked at most every `check_interval` seconds by reading a version
+    counter (`catalog_version`, bumped by a trigger on products); the snapshot is
+    reloaded only when the version moved. When no version is available the snapshot
+    is simply reloaded once per interval.
+    """
+
+    def __init__(self, check_interval: float = 30.0, shortlist: int = 16) -> None:
+        self.check_interval = check_interval
+        self.shortlist = shortlist
+        self.version: Optional[int] = None
+        self._products: List[Any] = []
+        self._by_name: Dict[str, Any] = {}
+        self._by_lower: Dict[str, Any] = {}
+        self._grams: Dict[str, List[int]] = {}
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    # ---------- Refresh ----------
+    async def refresh_if_stale(self,
+                               loader: Callable[[], Awaitable[List[Any]]],
+                               version_fn: Callable[[], Awaitable[Optional[int]]]) -> None:
+        if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            try:
+                version = await version_fn()
+            except Exception as e:
+                logging.getLogger(__name__).debug("Catalog version check failed: %s", e)
+                version = None
+            if not self._loaded or version is None or version != self.version:
+                self.load(await loader(), version)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a version check on the next lookup."""
+        self._checked_at = 0.0
+
+    def load(self, products: List[Any], version: Optional[int] = None) -> None:
+        products = sorted(products, key=lambda p: p.product_name or "")
+        by_name: Dict[str, Any] = {}
+        by_lower: Dict[str, Any] = {}
+        grams: Dict[str, List[int]] = {}
+        for idx, p in enumerate(products):
+            name = (p.product_name or "").strip()
+            if not name:
+                continue
+            by_name[name] = p
+            by_lower.setdefault(name.lower(), p)
+            for g in _trigrams(name):
+                grams.setdefault(g, []).append(idx)
+        # Swap in whole so concurrent readers never see a half-built index
+        self._products, self._by_name, self._by_lower, self._grams = products, by_name, by_lower, grams
+        self.version = version
+        self._loaded = True
+
+    # ---------- Lookups ----------
+    def all(self) -> List[Any]:
+        return list(self._products)
+
+    def get(self, name: str) -> Optional[Any]:
+        """Exact name, then case-insensitive match."""
+        key = (name or "").strip()
+        return self._by_name.get(key) or self._by_lower.get(key.lower())
+
+    def _shortlist(self, name: str) -> List[int]:
+        hits: Counter = Counter()
+        for g in _trigrams(name):
+            for idx in self._grams.get(g, ()):
+                hits[idx] += 1
+        return [idx for idx, _ in hits.most_common(self.shortlist)]
+
+    def candidates(self, name: str) -> List[Any]:
+        """Products sharing the most trigrams with `name`, best first (at most `shortlist`)."""
+        return [self._products[idx] for idx in self._shortlist(name)]
+
+    def fuzzy(self, name: str, threshold: float = 0.8) -> Tuple[Optional[Any], float]:
+        """Best SequenceMatcher match among the trigram shortlist; (None, score) below threshold."""
+        target = (name or "").strip().lower()
+        if not target:
+            return None, 0.0
+        best: Optional[Any] = None
+        best_score = 0.0
+        # Catalog (name) order, so ties resolve the same way as a full scan
+        for idx in sorted(self._shortlist(target)):
+            p = self._products[idx]
+            score = SequenceMatcher(None, target, (p.product_name or "").strip().lower()).ratio()
+            if score > best_score:
+                best, best_score = p, score
+        if best_score >= threshold:
+            return best, best_score
+        return None, best_score
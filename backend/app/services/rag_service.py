@@ -1,40 +1,90 @@
+import hashlib
 import os
 import logging
+import time
 from typing import List, Optional
 
-import chromadb
-from chromadb.utils import embedding_functions
-import requests
-
 try:
-    # Prefer explicit import for HTTP client when available
+    # Prefer explicit import for HTTP client when available; optional with VECTOR_BACKEND=numpy
     from chromadb import HttpClient as ChromaHttpClient
-except Exception:  # pragma: no cover - fallback for older versions
+except Exception:  # pragma: no cover - chromadb missing or older version
     ChromaHttpClient = None
 
 import google.generativeai as genai
 
 from app.config import settings
+from app.services.bm25 import BM25Index, rrf
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_client import EmbeddingClient
+
+
+_EMBED_CACHE: Optional[EmbeddingCache] = None
+
+
+def _embedding_cache() -> Optional[EmbeddingCache]:
+    # Shared by every VectorDBService in the process, so the LRU and counters are too
+    global _EMBED_CACHE
+    if _EMBED_CACHE is None:
+        _EMBED_CACHE = EmbeddingCache.from_settings()
+    return _EMBED_CACHE
+
+
+def _kb_rows(df) -> List[dict]:
+    """
+    Knowledge-base rows with stable ids and content hashes.
+
+    The id derives from (product_name, category), so reordering the CSV keeps ids and
+    an edited row keeps its id with a new hash; repeated keys get a "-<n>" suffix.
+    """
+    rows = []
+    seen: dict = {}
+    for rec in df[["product_name", "category", "embedding_text"]].astype(str).to_dict("records"):
+        key = f"{rec['product_name']}\0{rec['category']}"
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        doc_id = "kb_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + (f"-{n}" if n else "")
+        content_hash = hashlib.sha256(f"{key}\0{rec['embedding_text']}".encode("utf-8")).hexdigest()
+        rows.append({
+            "id": doc_id,
+            "document": rec["embedding_text"],
+            "metadata": {
+                "product_name": rec["product_name"],
+                "category": rec["category"],
+                "content_hash": content_hash,
+            },
+        })
+    return rows
+
+
+# Cosine distance reported for lexical-only hits: that of an unrelated vector, so it never outranks a real one
+_UNSCORED_DISTANCE = 1.0
+
+
+def _exact_key(product_name: Optional[str], category: Optional[str]) -> tuple:
+    return (" ".join(str(product_name or "").split()).casefold(), str(category or "").strip().casefold())
 
 
 class VectorDBService:
     """
     Chroma client wrapper for RAG operations.
 
-    Uses HTTP client to connect to the Chroma server defined in docker-compose.
-    Embeddings are computed client-side via Google Generative AI embeddings
+    Uses HTTP client to connect to the Chroma server defined in docker-compose, or
+    with VECTOR_BACKEND=numpy an in-process NumpyVectorStore memory-mapped from
+    VECTOR_STORE_PATH (no server, no network hop). Embeddings are computed client-side via Google Generative AI embeddings
     using the GEMINI API key.
     """
 
     def __init__(self,
                  host: str | None = None,
                  port: int | None = None,
-                 api_key: Optional[str] = None):
+                 api_key: Optional[str] = None,
+                 backend: Optional[str] = None):
+        self.backend = backend or settings.VECTOR_BACKEND
         self._host = host or settings.CHROMA_HOST
         self._port = port or settings.CHROMA_PORT
         self._api_key = api_key if api_key is not None else (os.getenv("GOOGLE_API_KEY") or settings.GEMINI_API_KEY)
 
-        if ChromaHttpClient is None:
+        if self.backend == "chroma" and ChromaHttpClient is None:
             raise RuntimeError("Chroma HTTP client not available in this chromadb version.")
 
         # Force REST path for AI Studio API key usage
@@ -47,10 +97,21 @@ class VectorDBService:
         # Lazy init: do not connect on import. Connect on first use.
         self.client = None
         self.collection = None
+        self.embedder = EmbeddingClient(api_key=self._api_key or None, cache=_embedding_cache())
+        self._exact: Optional[dict] = None
+        self._bm25: Optional[BM25Index] = None
+        self._indexes_loaded = 0.0
 
     def _ensure_client(self):
         if self.client and self.collection:
             return
+        if self.backend == "numpy":
+            # Imported here so the Chroma backend does not need numpy
+            from app.services.vector_store import NumpyVectorStore
+
+            self.collection = NumpyVectorStore(settings.VECTOR_STORE_PATH)
+            self.client = self.collection
+            return
         last_err: Exception | None = None
         for attempt in range(1, 11):  # up to ~5s with backoff
             try:
@@ -81,30 +142,9 @@ class VectorDBService:
     def _embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
         Compute embeddings using AI Studio REST API to ensure API key support.
+        Batched (batchEmbedContents) over a pooled session; see EmbeddingClient.
         """
-        api_key = os.getenv("GOOGLE_API_KEY") or settings.GEMINI_API_KEY
-        if not api_key:
-            raise RuntimeError("GOOGLE_API_KEY/GEMINI_API_KEY not set for embeddings")
-
-        # Use AI Studio REST v1 endpoint with API key header
-        url = "https://generativelanguage.googleapis.com/v1/models/text-embedding-004:embedContent"
-        headers = {"Content-Type": "application/json", "x-goog-api-key": api_key}
-        vectors: List[List[float]] = []
-        for t in texts:
-            payload = {
-                "model": "models/text-embedding-004",
-                "content": {"parts": [{"text": str(t)}]},
-            }
-            resp = requests.post(url, json=payload, headers=headers, timeout=30)
-            if resp.status_code != 200:
-                raise RuntimeError(f"Embedding HTTP {resp.status_code}: {resp.text[:200]}")
-            data = resp.json()
-            emb = data.get("embedding") or {}
-            values = emb.get("values")
-            if not values:
-                raise RuntimeError("Embedding response missing values")
-            vectors.append(values)
-        return vectors
+        return self.embedder.embed(texts)
 
     def ingest_knowledge_base(self, csv_path: str) -> int:
         import pandas as pd
@@ -119,24 +159,102 @@ class VectorDBService:
         if missing:
             raise ValueError(f"KB CSV missing columns: {missing}")
 
-        documents = df["embedding_text"].astype(str).tolist()
-        metadatas = df[["product_name", "category"]].to_dict("records")
-        ids = [f"kb_{i}" for i in range(len(df))]
+        rows = _kb_rows(df)
+        stored = self._stored_hashes()
+        changed = [r for r in rows if stored.get(r["id"]) != r["metadata"]["content_hash"]]
+        current = {r["id"] for r in rows}
+        # Includes legacy positional ids (kb_0, kb_1, ...) from earlier ingests
+        removed = [i for i in stored if i not in current]
+
+        # Chroma caps rows per request; write in chunks
+        step = 1000
+        for i in range(0, len(removed), step):
+            self.collection.delete(ids=removed[i : i + step])  # type: ignore
+        if changed:
+            # Compute embeddings client-side to avoid server-side gRPC
+            embeddings = self._embed_texts([r["document"] for r in changed])
+            for i in range(0, len(changed), step):
+                chunk = changed[i : i + step]
+                self.collection.upsert(  # type: ignore
+                    ids=[r["id"] for r in chunk],
+                    documents=[r["document"] for r in chunk],
+                    metadatas=[r["metadata"] for r in chunk],
+                    embeddings=embeddings[i : i + step],
+                )
+        self._set_indexes((r["id"], r["document"], r["metadata"]) for r in rows)
+        logging.getLogger(__name__).info(
+            "Knowledge base sync: %d rows, %d embedded/upserted, %d unchanged, %d removed",
+            len(rows), len(changed), len(rows) - len(changed), len(removed),
+        )
+        return len(rows)
+
+    def _scan(self, include: List[str]):
+        """Yield (id, document, metadata) for the whole collection, a page at a time."""
+        step = 1000
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=step, offset=offset)  # type: ignore
+            ids = page.get("ids") or []
+            docs = page.get("documents") or [None] * len(ids)
+            metas = page.get("metadatas") or [None] * len(ids)
+            yield from zip(ids, docs, (m or {} for m in metas))
+            if len(ids) < step:
+                return
+            offset += step
 
-        # Upsert behavior: delete existing IDs first to avoid duplication
-        try:
-            existing = self.collection.get(ids=ids)
-            if existing and existing.get("ids"):
-                self.collection.delete(ids=existing["ids"])  # type: ignore
-        except Exception:
-            pass
+    def _stored_hashes(self) -> dict:
+        """id -> content_hash for everything in the collection (None for rows without one)."""
+        return {doc_id: meta.get("content_hash") for doc_id, _, meta in self._scan(["metadatas"])}
 
-        # Compute embeddings client-side to avoid server-side gRPC
-        embeddings = self._embed_texts(documents)
-        self.collection.add(documents=documents, metadatas=metadatas, ids=ids, embeddings=embeddings)
-        return len(ids)
+    # ---------- Local indexes: exact (product, category) lookup and BM25 ----------
+    def _set_indexes(self, entries) -> None:
+        entries = list(entries)
+        index: dict = {}
+        for doc_id, document, meta in entries:
+            key = _exact_key(meta.get("product_name"), meta.get("category"))
+            # A key with several rows has no single exact answer: leave it to semantic search
+            index[key] = None if key in index else {"id": doc_id, "document": document, "metadata": meta}
+        self._exact = index
+        self._bm25 = BM25Index([e[0] for e in entries], [e[1] or "" for e in entries], [e[2] for e in entries])
+        self._indexes_loaded = time.monotonic()
 
-    def semantic_search(self, query: str, n_results: int = 3, category: str | None = None, product_name: str | None = None) -> dict:
+    def _indexes_fresh(self) -> bool:
+        return self._exact is not None and time.monotonic() - self._indexes_loaded <= settings.KB_LOOKUP_SECONDS
+
+    def _ensure_indexes(self) -> None:
+        """Built at ingest; otherwise (re)loaded from the collection every KB_LOOKUP_SECONDS."""
+        if not self._indexes_fresh():
+            self._ensure_client()
+            self._set_indexes(self._scan(["documents", "metadatas"]))
+
+    def lookup(self, product_name: str, category: str) -> Optional[dict]:
+        """
+        The knowledge-base row for exactly (product_name, category), matched case- and
+        whitespace-insensitively, or None. No embedding call and no vector search.
+        """
+        self._ensure_indexes()
+        return self._exact.get(_exact_key(product_name, category))
+
+    async def async_lookup(self, product_name: str, category: str) -> Optional[dict]:
+        if self._indexes_fresh():
+            # Warm index: a dict lookup, no thread hop
+            return self._exact.get(_exact_key(product_name, category))
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: self.lookup(product_name, category))
+
+    def semantic_search(self, query: str, n_results: int = 3, category: str | None = None,
+                        product_name: str | None = None, mode: str | None = None) -> dict:
+        """
+        Knowledge-base retrieval in Chroma's query result shape (plus fused "scores").
+        Rows the vector search did not score get distance _UNSCORED_DISTANCE; rank by "scores".
+
+        mode (default RAG_RETRIEVAL): "vector" is embedding search only; "hybrid" fuses
+        the vector ranking with a BM25 ranking over embedding_text by reciprocal rank;
+        "lexical_first" is hybrid, but returns the BM25 ranking without embedding the
+        query when it is decisive (see _lexical_decisive).
+        """
         self._ensure_client()
         # Build Chroma v0.5-style where filter. When combining multiple conditions,
         # use a single top-level operator (e.g., $and) to satisfy the validator.
@@ -153,10 +271,62 @@ class VectorDBService:
         elif product_name:
             where = {"product_name": {"$eq": product_name}}
         n = n_results or settings.RAG_TOP_K
+        mode = mode or settings.RAG_RETRIEVAL
+
+        lexical: List[tuple] = []
+        if mode != "vector":
+            try:
+                self._ensure_indexes()
+                lexical = self._bm25.search(query, max(n * 4, 20), where)
+            except Exception as e:
+                logging.getLogger(__name__).warning("Lexical index unavailable, vector search only: %s", e)
+                mode = "vector"
+        if mode == "lexical_first" and self._lexical_decisive(lexical, by_product=not product_name):
+            top = lexical[:n]
+            return {
+                "ids": [[self._bm25.ids[r] for r, _ in top]],
+                "documents": [[self._bm25.documents[r] for r, _ in top]],
+                "metadatas": [[self._bm25.metadatas[r] for r, _ in top]],
+                "distances": [[_UNSCORED_DISTANCE] * len(top)],
+                "scores": [[score for _, score in top]],
+            }
+
         # Client-side embed to avoid server embedding
         emb = self._embed_texts([query])[0]
-        result = self.collection.query(query_embeddings=[emb], n_results=n, where=where)  # type: ignore
-        return result
+        if mode == "vector":
+            return self.collection.query(query_embeddings=[emb], n_results=n, where=where)  # type: ignore
+        result = self.collection.query(query_embeddings=[emb], n_results=max(n * 4, 20), where=where)  # type: ignore
+        rows = {}
+        vec_ids = (result.get("ids") or [[]])[0]
+        for i, doc_id in enumerate(vec_ids):
+            rows[doc_id] = (result["documents"][0][i], result["metadatas"][0][i], result["distances"][0][i])
+        for r, _ in lexical:
+            rows.setdefault(self._bm25.ids[r], (self._bm25.documents[r], self._bm25.metadatas[r], _UNSCORED_DISTANCE))
+        fused = rrf([vec_ids, [self._bm25.ids[r] for r, _ in lexical]])[:n]
+        return {
+            "ids": [[doc_id for doc_id, _ in fused]],
+            "documents": [[rows[doc_id][0] for doc_id, _ in fused]],
+            "metadatas": [[rows[doc_id][1] for doc_id, _ in fused]],
+            "distances": [[rows[doc_id][2] for doc_id, _ in fused]],
+            "scores": [[score for _, score in fused]],
+        }
+
+    def _lexical_decisive(self, lexical: List[tuple], by_product: bool) -> bool:
+        """
+        True when the best BM25 hit scores at least RAG_LEXICAL_DECISIVE times the
+        runner-up. Without a product filter the runner-up is the best hit for another
+        product, so a bare product name ("ሃበሻ"), which ties all of that product's rows,
+        counts as decisive.
+        """
+        if not lexical:
+            return False
+        top_row, top_score = lexical[0]
+        if by_product:
+            product = self._bm25.metadatas[top_row].get("product_name")
+            others = [sc for r, sc in lexical if self._bm25.metadatas[r].get("product_name") != product]
+        else:
+            others = [sc for _, sc in lexical[1:]]
+        return not others or top_score >= settings.RAG_LEXICAL_DECISIVE * others[0]
 
     async def async_semantic_search(self, query: str, n_results: int | None = None, category: str | None = None, product_name: str | None = None) -> dict:
         # Simple thread offload for compatibility with async call sites
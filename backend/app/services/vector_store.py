@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Fallback name for indexes written before meta.json recorded the vectors file
+_VECTORS = "vectors.f32"
+_META = "meta.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class NumpyVectorStore:
+    """
+    In-process cosine index standing in for a Chroma collection.
+
+    Vectors are stored L2-normalized as a float32 matrix in `<path>/vectors-<id>.f32`
+    and memory-mapped read-only; ids, documents, metadatas and the name of that
+    vectors file live in `<path>/meta.json`, with each metadata key also kept as a
+    column array for filtering. A query masks rows with the `where` filter (`$eq`
+    and `$and`, the subset VectorDBService builds) and takes the top-k of one
+    matrix-vector product.
+
+    Implements the collection calls VectorDBService makes (get, upsert, delete,
+    query), returning Chroma-shaped results. A write puts the vectors in a new file
+    and then atomically replaces meta.json, so a reader always pairs a meta with the
+    matrix it describes; readers in other processes pick up a rewrite on their next call.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[tuple] = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._refresh()
+
+    # ---------- Persistence ----------
+    def _refresh(self) -> None:
+        meta_path = os.path.join(self.path, _META)
+        try:
+            st = os.stat(meta_path)
+        except FileNotFoundError:
+            return
+        # Every save renames a new file into place, so the inode changes even within one mtime tick
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if version == self._version:
+            return
+        with self._lock:
+            try:
+                meta, vectors = self._read(meta_path)
+            except FileNotFoundError:
+                # A concurrent save removed the vectors file this meta named; its successor is in place
+                st = os.stat(meta_path)
+                version = (st.st_ino, st.st_mtime_ns, st.st_size)
+                meta, vectors = self._read(meta_path)
+            self._load(meta["ids"], meta["documents"], meta["metadatas"], vectors)
+            self._version = version
+
+    def _read(self, meta_path: str):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        n, dim = len(meta["ids"]), meta["dim"]
+        if n:
+            vectors_path = os.path.join(self.path, meta.get("vectors", _VECTORS))
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(n, dim))
+        else:
+            vectors = np.zeros((0, dim), dtype=np.float32)
+        return meta, vectors
+
+    def _load(self, ids, documents, metadatas, vectors) -> None:
+        self.ids, self.documents, self.metadatas, self.vectors = list(ids), list(documents), list(metadatas), vectors
+        keys = {k for m in self.metadatas for k in m}
+        self._columns = {
+            k: np.array([m.get(k) for m in self.metadatas], dtype=object) for k in keys
+        }
+
+    def _save(self, ids, documents, metadatas, vectors: np.ndarray) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        # Vectors go to a file no reader knows yet; meta's rename then switches readers over in one step
+        vectors_name = f"vectors-{uuid.uuid4().hex}.f32"
+        vec_tmp = os.path.join(self.path, vectors_name + ".tmp")
+        vectors.astype(np.float32).tofile(vec_tmp)
+        os.replace(vec_tmp, os.path.join(self.path, vectors_name))
+        meta_tmp = os.path.join(self.path, _META + ".tmp")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"dim": int(vectors.shape[1]), "vectors": vectors_name, "ids": ids, "documents": documents,
+                 "metadatas": metadatas},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(meta_tmp, os.path.join(self.path, _META))
+        # Superseded matrices; readers that already mapped one keep it until they refresh
+        for old in glob.glob(os.path.join(self.path, "vectors*.f32")):
+            if os.path.basename(old) != vectors_name:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+        self._version = None
+        self._refresh()
+
+    # ---------- Collection API ----------
+    def count(self) -> int:
+        self._refresh()
+        return len(self.ids)
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[Sequence[str]] = None,
+            limit: Optional[int] = None, offset: int = 0) -> dict:
+        self._refresh()
+        if ids is not None:
+            pos = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            rows = [pos[i] for i in ids if i in pos]
+        else:
+            rows = list(range(len(self.ids)))
+        rows = rows[offset : offset + limit if limit is not None else None]
+        return {
+            "ids": [self.ids[i] for i in rows],
+            "documents": [self.documents[i] for i in rows],
+            "metadatas": [self.metadatas[i] for i in rows],
+        }
+
+    def upsert(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict],
+               embeddings: Sequence[Sequence[float]]) -> None:
+        self._refresh()
+        new = _normalize(np.asarray(embeddings, dtype=np.float32))
+        replaced = set(ids)
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in replaced]
+        old = np.asarray(self.vectors[keep]) if keep else np.zeros((0, new.shape[1]), dtype=np.float32)
+        if old.shape[1] != new.shape[1]:
+            raise ValueError(f"Embedding dimension {new.shape[1]} does not match index dimension {old.shape[1]}")
+        self._save(
+            [self.ids[i] for i in keep] + list(ids),
+            [self.documents[i] for i in keep] + list(documents),
+            [self.metadatas[i] for i in keep] + list(metadatas),
+            np.vstack([old, new]),
+        )
+
+    def delete(self, ids: Sequence[str]) -> None:
+        self._refresh()
+        drop = set(ids)
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in drop]
+        if len(keep) == len(self.ids):
+            return
+        self._save(
+            [self.ids[i] for i in keep],
+            [self.documents[i] for i in keep],
+            [self.metadatas[i] for i in keep],
+            np.asarray(self.vectors[keep]).reshape(len(keep), self.vectors.shape[1]),
+        )
+
+    def _mask(self, where: Optional[dict]) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        if not where:
+            return mask
+        for clause in where.get("$and", [where]):
+            for key, cond in clause.items():
+                value = cond.get("$eq") if isinstance(cond, dict) else cond
+                column = self._columns.get(key)
+                if column is None:
+                    return np.zeros(len(self.ids), dtype=bool)
+                mask &= column == value
+        return mask
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[dict] = None) -> dict:
+        self._refresh()
+        mask = self._mask(where)
+        rows = np.flatnonzero(mask)
+        # Unfiltered: score the memmap in place instead of gathering a copy
+        matrix = self.vectors if rows.size == len(self.ids) else self.vectors[rows]
+        out: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        for q in queries:
+            if rows.size:
+                scores = matrix @ q
+                k = min(n_results, rows.size)
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                hits, dist = rows[top], (1.0 - scores[top]).tolist()
+            else:
+                hits, dist = [], []
+            out["ids"].append([self.ids[i] for i in hits])
+            out["documents"].append([self.documents[i] for i in hits])
+            out["metadatas"].append([self.metadatas[i] for i in hits])
+            out["distances"].append(dist)
+        return out
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: embedding knowledge-base texts, one request per text vs batched pipeline.
+
+Starts a local stand-in for the AI Studio embedding API (embedContent and
+batchEmbedContents, fixed per-request latency plus a small per-text cost,
+optional injected 429s) and embeds the same texts two ways:
+
+"per-text" reproduces the old VectorDBService._embed_texts: one requests.post
+per text to embedContent, a fresh connection each time, sequential.
+"batched" is the current EmbeddingClient: batchEmbedContents over one pooled
+session, EMBED_CONCURRENCY batches in flight, retry with backoff on 429/5xx.
+
+No real API calls are made.
+
+Usage (inside container):
+  python scripts/bench_embeddings.py [--texts 1000] [--latency-ms 20] [--error-rate 0.05]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from app.services.embedding_client import EmbeddingClient  # noqa: E402
+
+
+def _vector(text: str, dim: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big")
+    rnd = random.Random(seed)
+    return [rnd.uniform(-1, 1) for _ in range(dim)]
+
+
+def _stand_in_server(latency: float, per_text: float, error_rate: float, dim: int):
+    counts = {"requests": 0, "throttled": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:
+                counts["requests"] += 1
+                throttle = random.random() < error_rate
+                counts["throttled"] += throttle
+            if throttle:
+                out, status = {"error": {"code": 429, "message": "Resource exhausted"}}, 429
+            elif self.path.endswith(":batchEmbedContents"):
+                texts = [r["content"]["parts"][0]["text"] for r in body.get("requests", [])]
+                time.sleep(latency + per_text * len(texts))
+                out, status = {"embeddings": [{"values": _vector(t, dim)} for t in texts]}, 200
+            else:
+                time.sleep(latency + per_text)
+                out, status = {"embedding": {"values": _vector(body["content"]["parts"][0]["text"], dim)}}, 200
+            data = json.dumps(out).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if status == 429:
+                self.send_header("Retry-After", "0.05")
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counts
+
+
+def _per_text(base_url: str, texts: list[str]) -> list[list[float]]:
+    url = f"{base_url}/models/text-embedding-004:embedContent"
+    headers = {"Content-Type": "application/json", "x-goog-api-key": "bench", "Connection": "close"}
+    vectors = []
+    for t in texts:
+        payload = {"model": "models/text-embedding-004", "content": {"parts": [{"text": t}]}}
+        # The old loop had no retry; re-send throttled requests so both paths finish
+        while True:
+            resp = requests.post(url, json=payload, headers=headers, timeout=30)
+            if resp.status_code == 200:
+                break
+        vectors.append(resp.json()["embedding"]["values"])
+    return vectors
+
+
+def _report(label: str, seconds: float, n: int, requests_made: int) -> None:
+    print(f"{label:<9} {seconds:8.2f}s  {n / seconds:9.1f} texts/s  requests={requests_made}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stand-in server latency per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.2, help="stand-in server cost per embedded text")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    server, counts = _stand_in_server(args.latency_ms / 1000, args.per_text_ms / 1000, args.error_rate, args.dim)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    texts = [f"Product {i}: storage, ripeness and handling notes for batch {i}." for i in range(args.texts)]
+    try:
+        counts["requests"] = 0
+        t0 = time.perf_counter()
+        before = _per_text(base_url, texts)
+        _report("per-text", time.perf_counter() - t0, len(texts), counts["requests"])
+
+        client = EmbeddingClient(api_key="bench", base_url=base_url)
+        counts["requests"] = 0
+        t0 = time.perf_counter()
+        after = client.embed(texts)
+        _report("batched", time.perf_counter() - t0, len(texts), counts["requests"])
+        client.close()
+        assert before == after, "batched vectors differ from per-text vectors"
+        print(f"throttled responses injected: {counts['throttled']}")
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
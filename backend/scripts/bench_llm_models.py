@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-turn LLM setup overhead before/after the model registry.
+
+"before" rebuilds the tool declarations and constructs a fresh GenerativeModel
+for each chat call, as LLMService.chat used to do. "after" resolves the model
+through the cached registry. No network requests are made; only object
+construction and SDK validation are timed.
+
+Usage (inside container):
+  python scripts/bench_llm_models.py [--turns 200] [--calls-per-turn 3]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+
+def _per_turn(fn, turns: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(turns):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    p50 = statistics.median(samples)
+    p95 = sorted(samples)[max(0, int(0.95 * len(samples)) - 1)]
+    print(f"{label:<8} p50={p50:10.1f}us  p95={p95:10.1f}us  mean={statistics.mean(samples):10.1f}us")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--calls-per-turn", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "bench-placeholder")
+    import google.generativeai as genai
+    from app.services import llm_service as llm
+
+    gen_config = {"temperature": 0.7, "top_p": 0.9, "top_k": 40, "max_output_tokens": 2048}
+    registry = llm._ModelRegistry()
+
+    def before() -> None:
+        decls = llm._tool_declarations()
+        for _ in range(args.calls_per_turn):
+            genai.GenerativeModel("gemini-2.5-pro", tools=llm._wrap_tools(decls), generation_config=gen_config)
+
+    def after() -> None:
+        decls = llm.tool_declarations()
+        for _ in range(args.calls_per_turn):
+            registry.get("gemini-2.5-pro", decls, gen_config)
+
+    # Warm up both paths (imports, first registry build)
+    before()
+    after()
+
+    print(f"turns={args.turns} calls_per_turn={args.calls_per_turn}")
+    b = _per_turn(before, args.turns)
+    a = _per_turn(after, args.turns)
+    _report("before", b)
+    _report("after", a)
+    print(f"speedup (p50): {statistics.median(b) / max(statistics.median(a), 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: appending a message to session history, legacy JSON blob vs hash + list layout.
+
+"legacy" reproduces the old SessionManager.add_message: GET the whole session
+document, EXPIRE, append and trim in Python, then SETEX the whole document back.
+"hash+list" is the current SessionManager.add_message (one pipeline: HSET
+last_active, RPUSH/LTRIM the message, EXPIRE). Each history size is seeded fresh
+and then appended to while capping history at that size, so every sample
+operates on a full history. Payload bytes are counted from the values sent to
+and read from Redis (protocol framing excluded).
+
+Requires a reachable Redis at REDIS_URL.
+
+Usage (inside container):
+  python scripts/bench_session_layout.py [--sizes 20 200] [--appends 200]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from app.orchestrator.session_manager import SessionManager, _now_iso  # noqa: E402
+
+
+def _message(i: int) -> dict:
+    return {"role": "user" if i % 2 else "assistant",
+            "content": f"Message {i}: how much are tomatoes per kg in Addis today?",
+            "timestamp": time.time()}
+
+
+async def _bench_legacy(sm: SessionManager, size: int, appends: int) -> tuple[list[float], int]:
+    key = f"session:bench-legacy-{uuid.uuid4()}"
+    doc = sm._new_session_data(key)
+    doc["conversation_history"] = [_message(i) for i in range(size)]
+    await sm.redis.setex(key, sm.ttl, json.dumps(doc))
+
+    samples: list[float] = []
+    nbytes = 0
+    for i in range(appends):
+        t0 = time.perf_counter()
+        raw = await sm.redis.get(key)
+        await sm.redis.expire(key, sm.ttl)
+        data = json.loads(raw)
+        hist = data.get("conversation_history", [])
+        hist.append(_message(size + i))
+        data["conversation_history"] = hist[-size:]
+        data["last_active"] = _now_iso()
+        out = json.dumps(data)
+        await sm.redis.setex(key, sm.ttl, out)
+        samples.append((time.perf_counter() - t0) * 1e3)
+        nbytes += len(raw) + len(out)
+    await sm.redis.delete(key)
+    return samples, nbytes
+
+
+async def _bench_hash_list(sm: SessionManager, size: int, appends: int) -> tuple[list[float], int]:
+    sid = f"bench-{uuid.uuid4()}"
+    sm.max_history = size
+    data = sm._new_session_data(sid)
+    data["conversation_history"] = [_message(i) for i in range(size)]
+    await sm._write(sid, data, replace_history=True)
+
+    samples: list[float] = []
+    nbytes = 0
+    for i in range(appends):
+        msg = _message(size + i)
+        t0 = time.perf_counter()
+        await sm._write(sid, {"last_active": _now_iso()}, new_messages=[msg])
+        samples.append((time.perf_counter() - t0) * 1e3)
+        nbytes += len(json.dumps(msg)) + len(json.dumps(_now_iso()))
+    await sm.redis.delete(sm._meta_key(sid), sm._history_key(sid))
+    return samples, nbytes
+
+
+def _report(label: str, samples: list[float], nbytes: int) -> None:
+    p50 = statistics.median(samples)
+    p95 = sorted(samples)[max(0, int(0.95 * len(samples)) - 1)]
+    print(f"  {label:<10} p50={p50:7.3f}ms  p95={p95:7.3f}ms  bytes/append={nbytes / len(samples):10.0f}")
+
+
+async def main_async(sizes: list[int], appends: int) -> None:
+    sm = SessionManager()
+    for size in sizes:
+        print(f"history={size} appends={appends}")
+        legacy, legacy_bytes = await _bench_legacy(sm, size, appends)
+        new, new_bytes = await _bench_hash_list(sm, size, appends)
+        _report("legacy", legacy, legacy_bytes)
+        _report("hash+list", new, new_bytes)
+        print(f"  speedup (p50): {statistics.median(legacy) / max(statistics.median(new), 1e-9):.1f}x  "
+              f"bytes ratio: {legacy_bytes / max(new_bytes, 1):.0f}x")
+    await sm.redis.aclose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--appends", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.sizes, args.appends))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
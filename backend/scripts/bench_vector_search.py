@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: knowledge-base vector search latency, Chroma vs in-process NumPy index.
+
+Loads the same synthetic documents (random vectors with product/category
+metadata, sized like the knowledge base) into a Chroma collection and into a
+NumpyVectorStore in a temporary directory, then times semantic_search-shaped
+queries (n_results=3; unfiltered, category filter, and product+category $and
+filter) and prints p50/p99 per backend. Query vectors are precomputed, so no
+embedding calls are made and only retrieval is measured.
+
+Chroma is the HTTP server at CHROMA_HOST:CHROMA_PORT (a throwaway collection is
+created and dropped); with --in-process, or when the server is unreachable, an
+in-process chromadb client is used instead, which leaves out the network hop.
+
+Usage (inside container):
+  python scripts/bench_vector_search.py [--docs 3000] [--queries 500] [--dim 768] [--in-process]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from app.config import settings  # noqa: E402
+from app.services.vector_store import NumpyVectorStore  # noqa: E402
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+# chromadb's HTTP client logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+_CATEGORIES = ["storage", "nutrition", "recipes", "seasonality", "selection", "handling"]
+
+
+def _dataset(n: int, dim: int, rng: np.random.Generator):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    metadatas = [
+        {"product_name": f"Product {i // len(_CATEGORIES)}", "category": _CATEGORIES[i % len(_CATEGORIES)]}
+        for i in range(n)
+    ]
+    ids = [f"kb_{i}" for i in range(n)]
+    documents = [f"{m['product_name']} {m['category']}: synthetic note {i}" for i, m in enumerate(metadatas)]
+    return ids, documents, metadatas, vectors
+
+
+def _chroma_collection(in_process: bool):
+    import chromadb
+
+    client = None
+    if not in_process:
+        try:
+            client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            client.heartbeat()
+        except Exception as e:
+            logging.warning("Chroma server unreachable (%s); using an in-process client", e)
+            client = None
+    label = "chroma-http" if client is not None else "chroma-local"
+    client = client or chromadb.EphemeralClient()
+    name = f"bench_vectors_{os.getpid()}"
+    return label, client, client.get_or_create_collection(name=name, embedding_function=None,
+                                                         metadata={"hnsw:space": "cosine"})
+
+
+def _wheres(metadatas, count: int, rng: np.random.Generator):
+    picks = rng.integers(0, len(metadatas), size=count)
+    kinds = [
+        ("unfiltered", lambda m: None),
+        ("category", lambda m: {"category": {"$eq": m["category"]}}),
+        ("product+category", lambda m: {"$and": [{"category": {"$eq": m["category"]}},
+                                                 {"product_name": {"$eq": m["product_name"]}}]}),
+    ]
+    return [(label, [build(metadatas[i]) for i in picks]) for label, build in kinds]
+
+
+def _time(collection, queries, wheres) -> np.ndarray:
+    samples = []
+    for q, where in zip(queries, wheres):
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=[q.tolist()], n_results=3, where=where)
+        samples.append(time.perf_counter() - t0)
+    return np.array(samples) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--in-process", action="store_true", help="compare against an in-process chromadb client")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    ids, documents, metadatas, vectors = _dataset(args.docs, args.dim, rng)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [("numpy", NumpyVectorStore(os.path.join(tmp, "index")))]
+        chroma = None
+        try:
+            label, client, collection = _chroma_collection(args.in_process)
+            chroma = (client, collection)
+            backends.append((label, collection))
+        except Exception as e:
+            logging.warning("Chroma unavailable, benchmarking the NumPy index only: %s", e)
+
+        try:
+            for label, collection in backends:
+                for i in range(0, len(ids), 1000):
+                    collection.upsert(ids=ids[i : i + 1000], documents=documents[i : i + 1000],
+                                      metadatas=metadatas[i : i + 1000], embeddings=vectors[i : i + 1000].tolist())
+                # Warm-up: connections, page cache, lazy index loads
+                _time(collection, queries[:10], [None] * 10)
+
+            print(f"{args.docs} docs, dim {args.dim}, {args.queries} queries per filter, n_results=3")
+            for kind, wheres in _wheres(metadatas, args.queries, rng):
+                for label, collection in backends:
+                    ms = _time(collection, queries, wheres)
+                    print(f"{kind:<17} {label:<13} p50 {np.percentile(ms, 50):8.3f} ms   "
+                          f"p99 {np.percentile(ms, 99):8.3f} ms")
+        finally:
+            if chroma is not None:
+                client, collection = chroma
+                client.delete_collection(collection.name)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,13 +5,18 @@ Database initialization script for Milestone 2.
 Creates required PostgreSQL schema in an idempotent way.
 Follows the schema and indexes defined in implementation_plan.md.
 
+Then applies the versioned MIGRATIONS below that are not yet recorded in
+schema_migrations, each in its own transaction.
+
 Usage (inside container):
-  python scripts/init_db.py
+  python scripts/init_db.py            # schema + pending migrations
+  python scripts/init_db.py --status   # list migrations and whether they are applied
 """
 import os
 import sys
 import time
 import logging
+from datetime import date
 import psycopg2
 from psycopg2.extras import execute_batch
 
@@ -42,11 +47,210 @@ def wait_for_db(conn_str: str, retries: int = 20, delay: float = 2.0) -> None:
     raise RuntimeError("PostgreSQL is not ready after retries.")
 
 
+# Monthly range-partitioned time series: partition key, columns (the primary key
+# must include the key) and indexes, created on the parent and inherited by partitions.
+PARTITIONED_TABLES = {
+    "competitor_pricing": {
+        "key": "date",
+        "columns": """
+            id SERIAL,
+            date DATE NOT NULL,
+            product_id INT REFERENCES products(product_id),
+            product_name VARCHAR(100),
+            price DECIMAL(10,2) NOT NULL,
+            source_market_type VARCHAR(50),
+            location_detail VARCHAR(100),
+            PRIMARY KEY (id, date)
+        """,
+        "indexes": [
+            """
+            CREATE INDEX IF NOT EXISTS idx_competitor_pricing_product_date_market
+            ON competitor_pricing (product_id, date, source_market_type);
+            """,
+        ],
+    },
+    "transaction_history": {
+        "key": "order_date",
+        "columns": """
+            transaction_id SERIAL,
+            order_date TIMESTAMP NOT NULL,
+            product_id INT REFERENCES products(product_id),
+            product_name VARCHAR(100),
+            quantity_ordered DECIMAL(10,2),
+            price_per_unit DECIMAL(10,2),
+            order_total_amount DECIMAL(10,2),
+            PRIMARY KEY (transaction_id, order_date)
+        """,
+        "indexes": [
+            """
+            CREATE INDEX IF NOT EXISTS idx_transaction_history_product_date
+            ON transaction_history (product_id, order_date);
+            """,
+        ],
+    },
+}
+
+
+def _partitioned_table_sql(table: str) -> str:
+    spec = PARTITIONED_TABLES[table]
+    return f"CREATE TABLE IF NOT EXISTS {table} ({spec['columns']}) PARTITION BY RANGE ({spec['key']});"
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def ensure_month_partitions(cur, table: str, start: date, end: date) -> list:
+    """
+    Create the monthly partitions of `table` covering `start`..`end` (inclusive) that
+    do not exist yet; returns the names created. Rows that already landed in the
+    default partition for a new month are moved into it, so this can run before or
+    after loading. Does not commit.
+    """
+    key = PARTITIONED_TABLES[table]["key"]
+    created = []
+    month = _month_start(start)
+    while month <= end:
+        upper = _next_month(month)
+        name = partition_name(table, month)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+        if not cur.fetchone()[0]:
+            # Build outside the parent, then attach: ATTACH checks the default partition
+            # holds no rows of the range, which the move guarantees.
+            cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);")
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default WHERE {key} >= %(lo)s AND {key} < %(hi)s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+                """,
+                {"lo": month, "hi": upper},
+            )
+            cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%(lo)s) TO (%(hi)s);",
+                        {"lo": month, "hi": upper})
+            created.append(name)
+        month = upper
+    return created
+
+
+def detach_partitions_before(cur, table: str, cutoff: date, drop: bool = False) -> list:
+    """
+    Detach (and optionally drop) the monthly partitions of `table` that end on or before
+    `cutoff`; returns their names. Detached tables keep their rows and can be archived
+    or re-attached. Does not commit.
+    """
+    cur.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname;
+        """,
+        (table,),
+    )
+    done = []
+    for (name,) in cur.fetchall():
+        suffix = name[len(table) + 2:]
+        if not name.startswith(f"{table}_p") or len(suffix) != 6 or not suffix.isdigit():
+            continue
+        month = date(int(suffix[:4]), int(suffix[4:]), 1)
+        if _next_month(month) > cutoff:
+            continue
+        cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+        if drop:
+            cur.execute(f"DROP TABLE {name};")
+        done.append(name)
+    return done
+
+
+def _partition_existing(cur, table: str) -> None:
+    """Convert `table` to its partitioned layout in place (no-op when already partitioned)."""
+    key = PARTITIONED_TABLES[table]["key"]
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    if row and row[0] == "p":
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+        return
+    if row is None:
+        cur.execute(_partitioned_table_sql(table))
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+        return
+
+    legacy = f"{table}_unpartitioned"
+    logging.info("Partitioning %s by month...", table)
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    # Free the index/sequence names for the new parent
+    cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s;", (legacy,))
+    for (index,) in cur.fetchall():
+        cur.execute(f"ALTER INDEX {index} RENAME TO {index[:50]}_unpart;")
+    seq_col = PARTITIONED_TABLES[table]["columns"].split()[0]
+    cur.execute("SELECT pg_get_serial_sequence(%s, %s);", (legacy, seq_col))
+    old_seq = cur.fetchone()[0]
+    if old_seq:
+        cur.execute(f"ALTER SEQUENCE {old_seq} RENAME TO {table}_{seq_col}_seq_unpart;")
+
+    cur.execute(_partitioned_table_sql(table))
+    cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;")
+    cur.execute(f"SELECT MIN({key})::date, MAX({key})::date FROM {legacy};")
+    lo, hi = cur.fetchone()
+    if lo is not None:
+        ensure_month_partitions(cur, table, lo, hi)
+    cur.execute(f"INSERT INTO {table} SELECT * FROM {legacy};")
+    cur.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE((SELECT MAX({seq_col}) FROM {table}), 0) + 1, false);",
+        (table, seq_col),
+    )
+    cur.execute(f"DROP TABLE {legacy};")
+    for sql in PARTITIONED_TABLES[table]["indexes"]:
+        cur.execute(sql)
+
+
+def _partition_price_history(cur) -> None:
+    today = date.today()
+    for table in PARTITIONED_TABLES:
+        _partition_existing(cur, table)
+        # Current month and the next so live inserts never fall into the default partition
+        ensure_month_partitions(cur, table, today, _next_month(today))
+
+
+_ROLLUP_REBUILD_SQL = """
+    INSERT INTO pricing_daily_rollup (product_id, source, market, day, n, price_sum, price_min, price_max)
+    SELECT product_id, 'competitor', COALESCE(source_market_type, ''), date,
+           COUNT(*), SUM(price), MIN(price), MAX(price)
+    FROM competitor_pricing WHERE product_id IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    UNION ALL
+    SELECT product_id, 'transaction', '', order_date::date,
+           COUNT(*), SUM(price_per_unit), MIN(price_per_unit), MAX(price_per_unit)
+    FROM transaction_history WHERE product_id IS NOT NULL AND price_per_unit IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def backfill_pricing_rollup(cur) -> None:
+    """Build pricing_daily_rollup from the raw price history when it is empty."""
+    cur.execute("SELECT EXISTS (SELECT 1 FROM pricing_daily_rollup)")
+    if not cur.fetchone()[0]:
+        cur.execute(_ROLLUP_REBUILD_SQL)
+        logging.info("Backfilled pricing rollup: %d rows", cur.rowcount)
+
+
 def create_schema(conn):
     cur = conn.cursor()
 
     # Enable UUID extension
     cur.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp";')
+    # Trigram similarity operators/GIN opclass for product search
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
 
     # Users table
     cur.execute(
@@ -75,6 +279,50 @@ def create_schema(conn):
         """
     )
 
+    # Product search: trigram indexes for misspelled/partial names and a generated
+    # tsvector for word matches, used by DatabaseService.search_products_ranked
+    cur.execute(
+        """
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('simple', coalesce(product_name, '') || ' ' || coalesce(category, ''))
+        ) STORED;
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (product_name gin_trgm_ops);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_category_trgm ON products USING GIN (category gin_trgm_ops);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_search_tsv ON products USING GIN (search_tsv);")
+
+    # Catalog version: bumped on any change to products so app processes can refresh
+    # their in-memory catalog with a single-row read instead of reloading it.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        """
+    )
+    cur.execute("INSERT INTO catalog_version (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;")
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_version SET version = version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    cur.execute("DROP TRIGGER IF EXISTS trg_products_catalog_version ON products;")
+    cur.execute(
+        """
+        CREATE TRIGGER trg_products_catalog_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+        """
+    )
+
     # Inventory table
     cur.execute(
         """
@@ -98,6 +346,18 @@ def create_schema(conn):
         ON inventory (supplier_id, product_id, status);
         """
     )
+    # Partial indexes over live lots only; expired/sold-out rows (retired by the
+    # inventory sweeper) drop out of them, so availability reads stay small.
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_inventory_active_product
+        ON inventory (product_id, available_date) INCLUDE (quantity_kg, price_per_unit)
+        WHERE status = 'active';
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_inventory_active_expiry ON inventory (expiry_date) WHERE status = 'active';"
+    )
 
     # Orders table
     cur.execute(
@@ -116,8 +376,11 @@ def create_schema(conn):
         );
         """
     )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);")
+    # Keyset pagination of a customer's order history (newest first)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_orders_customer_date ON orders (customer_id, order_date DESC, order_id DESC);"
+    )
 
     # Order items
     cur.execute(
@@ -133,61 +396,142 @@ def create_schema(conn):
         """
     )
 
-    # Competitor pricing
+    # Per-lot allocations behind each order line (DatabaseService.place_order)
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS competitor_pricing (
-            id SERIAL PRIMARY KEY,
-            date DATE NOT NULL,
-            product_id INT REFERENCES products(product_id),
-            product_name VARCHAR(100),
-            price DECIMAL(10,2) NOT NULL,
-            source_market_type VARCHAR(50),
-            location_detail VARCHAR(100)
+        CREATE TABLE IF NOT EXISTS order_item_allocations (
+            allocation_id SERIAL PRIMARY KEY,
+            item_id INT NOT NULL REFERENCES order_items(item_id) ON DELETE CASCADE,
+            inventory_id INT NOT NULL REFERENCES inventory(inventory_id),
+            quantity_kg DECIMAL(10,2) NOT NULL CHECK (quantity_kg > 0),
+            price_per_unit DECIMAL(10,2) NOT NULL
         );
         """
     )
-    cur.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_competitor_pricing_product_date_market
-        ON competitor_pricing (product_id, date, source_market_type);
-        """
-    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_item_allocations_item ON order_item_allocations(item_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_item_allocations_inventory ON order_item_allocations(inventory_id);")
+
+    # Competitor pricing and transaction history: append-only time series, range
+    # partitioned by month (see PARTITIONED_TABLES / ensure_month_partitions)
+    for table in PARTITIONED_TABLES:
+        cur.execute(_partitioned_table_sql(table))
+        for sql in PARTITIONED_TABLES[table]["indexes"]:
+            cur.execute(sql)
 
-    # Transaction history
+    # Daily price rollup read by pricing insights; rows are rebuilt per (product, day)
+    # by scripts/load_dataset.py whenever pricing or transaction history is loaded.
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS transaction_history (
-            transaction_id SERIAL PRIMARY KEY,
-            order_date TIMESTAMP NOT NULL,
-            product_id INT REFERENCES products(product_id),
-            product_name VARCHAR(100),
-            quantity_ordered DECIMAL(10,2),
-            price_per_unit DECIMAL(10,2),
-            order_total_amount DECIMAL(10,2)
+        CREATE TABLE IF NOT EXISTS pricing_daily_rollup (
+            product_id INT NOT NULL REFERENCES products(product_id),
+            source VARCHAR(20) NOT NULL CHECK (source IN ('competitor','transaction')),
+            market VARCHAR(50) NOT NULL DEFAULT '',
+            day DATE NOT NULL,
+            n INT NOT NULL,
+            price_sum DECIMAL(14,2) NOT NULL,
+            price_min DECIMAL(10,2) NOT NULL,
+            price_max DECIMAL(10,2) NOT NULL,
+            PRIMARY KEY (product_id, source, market, day)
         );
         """
     )
-    cur.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_transaction_history_product_date
-        ON transaction_history (product_id, order_date);
-        """
-    )
 
     conn.commit()
     cur.close()
 
 
+# Versioned schema changes applied after create_schema, in order. Steps are SQL strings
+# or callables taking a cursor. Append new entries with the next version number; never
+# edit or reorder an applied one.
+MIGRATIONS = [
+    (
+        1,
+        "hot_path_indexes",
+        [
+            # get_supplier_pending_orders / get_supplier_schedule: supplier + status, ranged by delivery date
+            """
+            CREATE INDEX IF NOT EXISTS idx_orders_supplier_status_delivery
+            ON orders (supplier_id, status, delivery_date);
+            """,
+            # get_customer_orders loads items with order_id IN (...)
+            "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id);",
+            # Redundant: a prefix of idx_orders_customer_date
+            "DROP INDEX IF EXISTS idx_orders_customer;",
+        ],
+    ),
+    (
+        2,
+        "partition_price_history",
+        [_partition_price_history],
+    ),
+    (
+        3,
+        # Pricing reads the rollup by default (PRICING_USE_ROLLUP); fill it from history
+        # already in the database instead of waiting for the next load_dataset run
+        "backfill_pricing_rollup",
+        [backfill_pricing_rollup],
+    ),
+]
+
+
+def _ensure_migrations_table(conn) -> set:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+        cur.execute("SELECT version FROM schema_migrations;")
+        applied = {r[0] for r in cur.fetchall()}
+    conn.commit()
+    return applied
+
+
+def apply_migrations(conn) -> list:
+    """Apply pending MIGRATIONS in version order, one transaction each. Returns applied versions."""
+    applied = _ensure_migrations_table(conn)
+    done = []
+    for version, name, statements in sorted(MIGRATIONS):
+        if version in applied:
+            continue
+        logging.info("Applying migration %03d_%s...", version, name)
+        try:
+            with conn.cursor() as cur:
+                for step in statements:
+                    if callable(step):
+                        step(cur)
+                    else:
+                        cur.execute(step)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error("Migration %03d_%s failed; later migrations not applied.", version, name)
+            raise
+        done.append(version)
+    return done
+
+
 def main():
     db_url = get_db_url()
     logging.info("Using DATABASE_URL=%s", db_url)
     wait_for_db(db_url)
 
     with psycopg2.connect(db_url) as conn:
+        if "--status" in sys.argv[1:]:
+            applied = _ensure_migrations_table(conn)
+            for version, name, _ in sorted(MIGRATIONS):
+                print(f"{version:03d}_{name}: {'applied' if version in applied else 'pending'}")
+            return
         logging.info("Creating schema (idempotent)...")
         create_schema(conn)
         logging.info("Database schema initialized successfully.")
+        done = apply_migrations(conn)
+        logging.info("Migrations applied: %s", ", ".join(f"{v:03d}" for v in done) or "none pending")
 
 
 if __name__ == "__main__":
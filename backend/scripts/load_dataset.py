@@ -4,7 +4,9 @@ Dataset loader and knowledge base ingester for Milestone 2.
 
 Responsibilities:
 - Seed products from transactions dataset
-- Load competitor pricing and transaction history in batches
+- Load competitor pricing and transaction history in batches, creating the monthly
+  partitions the rows fall in first
+- Refresh the daily pricing rollup for the product-days that received rows
 - Ingest product knowledge base into Chroma (RAG)
 
 The script is safe to re-run (UPSERT/ON CONFLICT where applicable).
@@ -17,12 +19,20 @@ import sys
 import math
 import time
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Set, Tuple
 
 import psycopg2
 from psycopg2.extras import execute_batch
 import pandas as pd
 
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from scripts.init_db import backfill_pricing_rollup, ensure_month_partitions  # noqa: E402
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -99,12 +109,13 @@ def ensure_products(conn, transactions_df: pd.DataFrame) -> Dict[str, int]:
     return mapping
 
 
-def batch_insert_competitor_pricing(conn, df: pd.DataFrame, name_to_id: Dict[str, int]):
+def batch_insert_competitor_pricing(conn, df: pd.DataFrame, name_to_id: Dict[str, int]) -> Set[Tuple[int, object]]:
+    """Insert competitor pricing rows; returns the (product_id, day) pairs touched."""
     required_cols = {"date", "product_name", "price", "source_market_type", "location_detail"}
     missing = required_cols - set(df.columns)
     if missing:
         logging.warning("Competitor_Pricing sheet missing columns: %s; skipping.", missing)
-        return
+        return set()
 
     cur = conn.cursor()
     rows = []
@@ -127,8 +138,9 @@ def batch_insert_competitor_pricing(conn, df: pd.DataFrame, name_to_id: Dict[str
     if not rows:
         logging.warning("No competitor pricing rows to insert.")
         cur.close()
-        return
+        return set()
 
+    ensure_month_partitions(cur, "competitor_pricing", min(r[0] for r in rows), max(r[0] for r in rows))
     execute_batch(
         cur,
         """
@@ -141,14 +153,16 @@ def batch_insert_competitor_pricing(conn, df: pd.DataFrame, name_to_id: Dict[str
     conn.commit()
     cur.close()
     logging.info("Inserted competitor pricing rows: %d", len(rows))
+    return {(r[1], r[0]) for r in rows}
 
 
-def batch_insert_transactions(conn, df: pd.DataFrame, name_to_id: Dict[str, int]):
+def batch_insert_transactions(conn, df: pd.DataFrame, name_to_id: Dict[str, int]) -> Set[Tuple[int, object]]:
+    """Insert transaction history rows; returns the (product_id, day) pairs touched."""
     required_cols = {"order_date", "product_name", "quantity_ordered", "price_per_unit", "order_total_amount"}
     missing = required_cols - set(df.columns)
     if missing:
         logging.warning("Transactions sheet missing columns: %s; skipping.", missing)
-        return
+        return set()
 
     cur = conn.cursor()
     rows = []
@@ -171,8 +185,11 @@ def batch_insert_transactions(conn, df: pd.DataFrame, name_to_id: Dict[str, int]
     if not rows:
         logging.warning("No transaction rows to insert.")
         cur.close()
-        return
+        return set()
 
+    ensure_month_partitions(
+        cur, "transaction_history", min(r[0] for r in rows).date(), max(r[0] for r in rows).date()
+    )
     execute_batch(
         cur,
         """
@@ -186,6 +203,54 @@ def batch_insert_transactions(conn, df: pd.DataFrame, name_to_id: Dict[str, int]
     conn.commit()
     cur.close()
     logging.info("Inserted transaction rows: %d", len(rows))
+    return {(r[1], r[0].date()) for r in rows}
+
+
+# Rebuild the rollup rows of the given (product_id, day) pairs from the raw tables. Recomputing
+# whole days (rather than adding deltas) keeps the refresh idempotent across re-runs.
+_ROLLUP_KEYS = "SELECT DISTINCT product_id, day FROM unnest(%(product_ids)s::int[], %(days)s::date[]) AS k(product_id, day)"
+
+_ROLLUP_CLEAR_SQL = f"""
+    DELETE FROM pricing_daily_rollup r USING ({_ROLLUP_KEYS}) k
+    WHERE r.product_id = k.product_id AND r.day = k.day
+"""
+
+_ROLLUP_REFRESH_SQL = f"""
+    WITH keys AS ({_ROLLUP_KEYS})
+    INSERT INTO pricing_daily_rollup (product_id, source, market, day, n, price_sum, price_min, price_max)
+    SELECT cp.product_id, 'competitor', COALESCE(cp.source_market_type, ''), cp.date,
+           COUNT(*), SUM(cp.price), MIN(cp.price), MAX(cp.price)
+    FROM competitor_pricing cp JOIN keys k ON k.product_id = cp.product_id AND k.day = cp.date
+    GROUP BY 1, 2, 3, 4
+    UNION ALL
+    SELECT th.product_id, 'transaction', '', th.order_date::date,
+           COUNT(*), SUM(th.price_per_unit), MIN(th.price_per_unit), MAX(th.price_per_unit)
+    FROM transaction_history th JOIN keys k ON k.product_id = th.product_id AND k.day = th.order_date::date
+    WHERE th.price_per_unit IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+
+def refresh_pricing_rollup(conn, keys: Iterable[Tuple[int, object]]) -> None:
+    """Recompute pricing_daily_rollup for the (product_id, day) pairs that received new rows."""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    params = {"product_ids": [k[0] for k in keys], "days": [k[1] for k in keys]}
+    cur = conn.cursor()
+    # Same transaction: readers never see a product-day half rebuilt
+    cur.execute(_ROLLUP_CLEAR_SQL, params)
+    cur.execute(_ROLLUP_REFRESH_SQL, params)
+    conn.commit()
+    cur.close()
+    logging.info("Refreshed pricing rollup for %d product-days", len(keys))
+
+
+def ensure_pricing_rollup(conn) -> None:
+    """Backfill pricing_daily_rollup in full when it is empty (first run after the table was added)."""
+    cur = conn.cursor()
+    backfill_pricing_rollup(cur)
+    conn.commit()
+    cur.close()
 
 
 def ingest_knowledge_base(csv_path: str):
@@ -259,18 +324,24 @@ def main():
             logging.warning("Transactions sheet not present or missing product_name; cannot seed products.")
             name_to_id = {}
 
+        # Backfill the rollup from rows loaded before it existed; new rows are refreshed below
+        ensure_pricing_rollup(conn)
+        touched: Set[Tuple[int, object]] = set()
+
         # Insert competitor pricing
         if cp_df is not None:
-            batch_insert_competitor_pricing(conn, cp_df, name_to_id)
+            touched |= batch_insert_competitor_pricing(conn, cp_df, name_to_id)
         else:
             logging.warning("Competitor_Pricing sheet not found; skipping.")
 
         # Insert transactions
         if tx_df is not None:
-            batch_insert_transactions(conn, tx_df, name_to_id)
+            touched |= batch_insert_transactions(conn, tx_df, name_to_id)
         else:
             logging.warning("Transactions sheet not found; skipping transactions load.")
 
+        refresh_pricing_rollup(conn, touched)
+
     # Ingest knowledge base if present
     if kb_path:
         ingest_knowledge_base(kb_path)
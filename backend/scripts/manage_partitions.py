@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Maintain the monthly partitions of competitor_pricing and transaction_history.
+
+Creates partitions from the current month through --ahead months so live inserts
+never land in the default partition (run it monthly, e.g. from cron), and with
+--detach-before YYYY-MM detaches every partition ending on or before that month
+start (kept as standalone tables for archiving, or dropped with --drop). Daily
+aggregates already in pricing_daily_rollup are not affected by detaching.
+
+Usage (inside container):
+  python scripts/manage_partitions.py [--ahead 2] [--detach-before 2024-01 [--drop]]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from datetime import date
+
+import psycopg2
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from scripts.init_db import (  # noqa: E402
+    PARTITIONED_TABLES,
+    detach_partitions_before,
+    ensure_month_partitions,
+    get_db_url,
+)
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+
+
+def _add_months(d: date, months: int) -> date:
+    m = d.month - 1 + months
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ahead", type=int, default=2, help="months after the current one to pre-create")
+    parser.add_argument("--detach-before", metavar="YYYY-MM", help="detach partitions ending on or before this month")
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of keeping them")
+    args = parser.parse_args()
+
+    cutoff = None
+    if args.detach_before:
+        year, month = (int(x) for x in args.detach_before.split("-"))
+        cutoff = date(year, month, 1)
+
+    today = date.today()
+    with psycopg2.connect(get_db_url()) as conn:
+        with conn.cursor() as cur:
+            for table in PARTITIONED_TABLES:
+                created = ensure_month_partitions(cur, table, today, _add_months(today, args.ahead))
+                logging.info("%s: created %s", table, ", ".join(created) or "nothing (up to date)")
+                if cutoff:
+                    done = detach_partitions_before(cur, table, cutoff, drop=args.drop)
+                    logging.info("%s: %s %s", table, "dropped" if args.drop else "detached", ", ".join(done) or "nothing")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Retire dead inventory lots once: active lots past their expiry date become
+'expired', active lots with no quantity left become 'sold_out'.
+
+Same sweep the backend runs every INVENTORY_SWEEP_SECONDS; use this from cron
+when the in-process sweeper is disabled (INVENTORY_SWEEP_SECONDS=0).
+
+Usage (inside container):
+  python scripts/sweep_inventory.py [--batch-size 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# Ensure project root (/app) is on sys.path when executed as a script from /app/scripts
+_HERE = os.path.dirname(__file__)
+_ROOT = os.path.dirname(_HERE)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from app.config import settings  # noqa: E402
+from app.services.db_service import DatabaseService  # noqa: E402
+from app.services.inventory_sweeper import InventorySweeper  # noqa: E402
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.INVENTORY_SWEEP_BATCH)
+    args = parser.parse_args()
+    moved = asyncio.run(InventorySweeper(DatabaseService(), batch_size=args.batch_size).run_once())
+    print(f"expired={moved['expired']} sold_out={moved['sold_out']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _ensure_db_ready():
+    try:
+        from app.services.db_service import DatabaseService
+
+        db = DatabaseService()
+        await db.get_all_products()
+        return db
+    except Exception as e:  # pragma: no cover - environment dependent
+        pytest.skip(f"Database not reachable or uninitialized: {e}")
+
+
+async def test_iter_customer_orders_pages_every_order_once(db_serialized):
+    """
+    Keyset paging over several pages returns every order exactly once, in the unpaged
+    order, including ties on order_date and orders with no order_date at all.
+    """
+    from sqlalchemy import text
+
+    db = await _ensure_db_ready()
+    stamp = int(time.time() * 1000)
+    customer_id = await db.create_user(
+        phone=f"09{(stamp + 5) % 10}{(stamp + 5) % 9999999:07d}",
+        name="Customer Paging",
+        user_type="customer",
+        location="Addis Ababa",
+    )
+
+    base = datetime(2030, 1, 1, 12, 0, 0)
+    order_dates = [None, None, base, base, base, base - timedelta(days=1), base - timedelta(days=2)]
+    async with db._session_factory() as session:
+        for order_date in order_dates:
+            order_id = await db.create_order(customer_id, date(2030, 1, 5), "Addis Ababa", 10.0)
+            await session.execute(
+                text("UPDATE orders SET order_date = :d WHERE order_id = CAST(:id AS uuid)"),
+                {"d": order_date, "id": order_id},
+            )
+        await session.commit()
+
+    expected = [o["order_id"] for o in await db.get_customer_orders(customer_id)]
+    pages = [[o["order_id"] for o in page] async for page in db.iter_customer_orders(customer_id, page_size=2)]
+
+    assert len(expected) == len(order_dates)
+    assert [len(p) for p in pages] == [2, 2, 2, 1]
+    assert [oid for page in pages for oid in page] == expected
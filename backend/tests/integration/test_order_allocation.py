@@ -0,0 +1,79 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _ensure_db_ready():
+    try:
+        from app.services.db_service import DatabaseService
+
+        db = DatabaseService()
+        prods = await db.get_all_products()
+        assert prods, "Products table must be populated (run dataset loader)."
+        return db, prods
+    except Exception as e:  # pragma: no cover - environment dependent
+        pytest.skip(f"Database not reachable or uninitialized: {e}")
+
+
+async def test_place_order_never_allocates_expired_lot(db_serialized):
+    """
+    An active lot past its expiry date (not yet swept) sorts first under the
+    "expiry" policy but must not be allocated; the order is filled from fresher lots.
+    """
+    db, prods = await _ensure_db_ready()
+    product = prods[0]
+
+    stamp = int(time.time() * 1000)
+    supplier_id = await db.create_user(
+        phone=f"09{stamp % 10}{stamp % 9999999:07d}",
+        name="Supplier Expiry",
+        user_type="supplier",
+        location="Addis Ababa",
+    )
+    customer_id = await db.create_user(
+        phone=f"09{(stamp + 3) % 10}{(stamp + 3) % 9999999:07d}",
+        name="Customer Expiry",
+        user_type="customer",
+        location="Addis Ababa",
+    )
+
+    today = date.today()
+    expired_id = await db.add_inventory(
+        supplier_id=supplier_id,
+        product_id=product.product_id,
+        quantity=50.0,
+        price=10.0,
+        # Far enough back to sort ahead of every other lot of the product
+        available_date=today - timedelta(days=3660),
+        expiry_date=today - timedelta(days=3650),
+        image_url=None,
+    )
+    await db.add_inventory(
+        supplier_id=supplier_id,
+        product_id=product.product_id,
+        quantity=50.0,
+        price=10.0,
+        available_date=today,
+        expiry_date=today + timedelta(days=1),
+        image_url=None,
+    )
+
+    try:
+        result = await db.place_order(
+            customer_id=customer_id,
+            delivery_date=today + timedelta(days=1),
+            delivery_location="Addis Ababa",
+            items=[{"product_name": product.product_name, "quantity_kg": 2}],
+            policy="expiry",
+        )
+        assert result["order_id"]
+
+        lots = {row["inventory_id"]: row for row in await db.get_supplier_inventory(supplier_id)}
+        assert lots[expired_id]["quantity_kg"] == 50.0
+    finally:
+        # Retire the lot so later runs don't find it ahead of their own
+        await db.update_inventory_status(expired_id, "expired")
@@ -1,4 +1,6 @@
 import asyncio
+from contextlib import asynccontextmanager
+
 import pytest
 
 
@@ -23,6 +25,10 @@ class FakeSessionManager:
         }
         return sid
 
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        yield None
+
     async def get_session(self, session_id: str):
         return self.store.get(f"session:{session_id}")
 
@@ -45,6 +51,9 @@ class FakeIntentDetector:
     def detect(self, text: str):
         return {"intent": "product_inquiry", "entities": {}}
 
+    def detect_rules(self, text: str):
+        return None
+
 
 class FakeLLMService:
     def __init__(self):
@@ -57,6 +66,9 @@ class FakeLLMService:
             return {"type": "tool_call", "name": "search_products", "arguments": {"query": "tomato"}}
         return {"type": "text", "content": "Here you go!"}
 
+    async def achat(self, messages, tools=None, allow_tools=True):
+        return self.chat(messages, tools=tools)
+
 
 class FakeToolRegistry:
     async def execute(self, name: str, args, session_id=None):
@@ -73,7 +85,7 @@ async def test_orchestrator_tool_followup(monkeypatch):
     monkeypatch.setattr(convo_mod, "SessionManager", lambda: FakeSessionManager())
     monkeypatch.setattr(convo_mod, "IntentDetector", lambda: FakeIntentDetector())
     monkeypatch.setattr(convo_mod, "LLMService", lambda: FakeLLMService())
-    monkeypatch.setattr(convo_mod, "ToolRegistry", lambda: FakeToolRegistry())
+    monkeypatch.setattr(convo_mod, "ToolRegistry", lambda **_: FakeToolRegistry())
 
     orch = convo_mod.ConversationOrchestrator()
 
@@ -85,3 +97,77 @@ async def test_orchestrator_tool_followup(monkeypatch):
     assert res["type"] == "text"
     assert res["content"] == "Here you go!"
 
+
+
+async def test_orchestrator_runs_multiple_tool_calls_in_one_round():
+    import importlib
+    convo_mod = importlib.import_module("app.orchestrator.conversation")
+
+    class MultiCallLLM:
+        def __init__(self):
+            self.calls = 0
+            self.seen_messages = []
+
+        async def achat(self, messages, tools=None, allow_tools=True):
+            self.calls += 1
+            self.seen_messages.append(messages)
+            if self.calls == 1:
+                calls = [
+                    {"name": "get_pricing_insights", "arguments": {"product_name": "Tomato"}},
+                    {"name": "get_pricing_insights", "arguments": {"product_name": "Onion"}},
+                    {"name": "search_products", "arguments": {"query": "vegetables"}},
+                ]
+                return {"type": "tool_call", "name": calls[0]["name"], "arguments": calls[0]["arguments"], "calls": calls}
+            return {"type": "text", "content": "Tomato 40, Onion 30; both in stock."}
+
+    class ConcurrentTools:
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.executed = []
+
+        async def execute(self, name, args, session_id=None):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            self.executed.append((name, dict(args)))
+            return {"success": True, "data": None, "message": f"{name}:{sorted(args.values())}"}
+
+    sessions = FakeSessionManager()
+    tools = ConcurrentTools()
+    llm = MultiCallLLM()
+    orch = convo_mod.ConversationOrchestrator(sessions=sessions, tools=tools, llm=llm, db=object())
+    sid = await sessions.create_session()
+
+    res = await orch.process_message(sid, "price of tomatoes and onions and what's in stock")
+    assert res["content"] == "Tomato 40, Onion 30; both in stock."
+    # One tool round + one finalization round
+    assert llm.calls == 2
+    assert len(tools.executed) == 3
+    assert tools.max_in_flight == 3
+    followup = llm.seen_messages[1][-1]["content"]
+    assert "[search_products]" in followup and "Onion" in followup
+
+
+async def test_llm_timeout_before_any_tool_asks_user_to_retry():
+    import importlib
+    convo_mod = importlib.import_module("app.orchestrator.conversation")
+    from app.services.exceptions import LLMTimeoutError
+
+    class SlowLLM:
+        async def achat(self, messages, tools=None, allow_tools=True):
+            raise LLMTimeoutError("LLM call exceeded 1s")
+
+    class NoTools:
+        async def execute(self, name, args, session_id=None):
+            raise AssertionError("no tool should run")
+
+    sessions = FakeSessionManager()
+    orch = convo_mod.ConversationOrchestrator(sessions=sessions, tools=NoTools(), llm=SlowLLM(), db=object())
+    sid = await sessions.create_session()
+
+    res = await orch.process_message(sid, "What vegetables are available?")
+    assert res["type"] == "text"
+    assert "try again" in res["content"]
+    assert "No results were returned" not in res["content"]
@@ -0,0 +1,103 @@
+import pytest
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeSessions:
+    def __init__(self, session):
+        self.session = session
+        self.updates = []
+
+    async def update_session(self, session_id, updates):
+        self.updates.append(updates)
+        self.session.update(updates)
+
+
+class FakeTools:
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = []
+
+    async def execute(self, name, args, session_id=None):
+        self.calls.append((name, args))
+        return {"success": self.success, "data": None, "message": f"{name} ok"}
+
+
+def _router(session, tools, intents=None):
+    from app.orchestrator.intent_detector import IntentDetector
+    from app.orchestrator.router import TieredRouter
+
+    # Rules only; no LLM model needed
+    detector = IntentDetector.__new__(IntentDetector)
+    return TieredRouter(tools, FakeSessions(session), detector, intents=intents)
+
+
+def _supplier():
+    return {"registered": True, "user_type": "supplier", "user_id": "u1", "context": {"current_flow": "idle"}}
+
+
+async def test_complete_add_inventory_goes_straight_to_tool():
+    tools = FakeTools()
+    router = _router(_supplier(), tools)
+    reply = await router.route(
+        "s1", router.sessions.session,
+        "Add inventory, Tomato, 50 kg, at 55 ETB/kg, available date: 2030-01-02, expiry date: 2030-01-09",
+    )
+    assert reply["content"] == "add_inventory ok"
+    assert reply["metadata"] == {"intent": "add_inventory", "route": "fast_path"}
+    name, args = tools.calls[0]
+    assert name == "add_inventory"
+    assert args["quantity_kg"] == 50.0 and args["price_per_unit"] == 55.0
+    stats = router.stats.snapshot()
+    assert stats["fast_path"] == 1 and stats["intents"]["add_inventory"]["hit_rate"] == 1.0
+
+
+async def test_incomplete_or_unmatched_turns_defer_to_llm():
+    tools = FakeTools()
+    router = _router(_supplier(), tools)
+    assert await router.route("s1", router.sessions.session, "I want to add tomatoes") is None
+    assert await router.route("s1", router.sessions.session, "hello, what do you sell?") is None
+    assert tools.calls == []
+    stats = router.stats.snapshot()
+    assert stats["llm"] == 2 and stats["fast_path"] == 0
+
+
+async def test_supplier_intent_from_customer_defers_to_llm():
+    tools = FakeTools()
+    session = {"registered": True, "user_type": "customer", "context": {}}
+    router = _router(session, tools)
+    assert await router.route("s1", session, "show my delivery schedule this week") is None
+    assert tools.calls == []
+
+
+async def test_tool_failure_falls_back_and_is_counted():
+    tools = FakeTools(success=False)
+    router = _router(_supplier(), tools)
+    assert await router.route("s1", router.sessions.session, "what's my delivery schedule next week?") is None
+    assert router.stats.snapshot()["intents"]["check_schedule"]["fallback"] == 1
+
+
+async def test_registration_phone_followup_uses_last_intent():
+    tools = FakeTools()
+    session = {"registered": False, "context": {"current_flow": "registering", "last_intent": "registration_supplier"}}
+    router = _router(session, tools)
+    reply = await router.route("s1", session, "0911223344")
+    assert reply is not None
+    assert tools.calls == [("register_user", {"user_type": "supplier", "phone": "0911223344"})]
+
+
+async def test_disabled_intents_are_not_fast_pathed():
+    tools = FakeTools()
+    router = _router(_supplier(), tools, intents=["check_stock"])
+    assert await router.route("s1", router.sessions.session, "what's my delivery schedule next week?") is None
+    assert tools.calls == []
+
+
+async def test_supplier_stock_question_goes_straight_to_tool():
+    tools = FakeTools()
+    router = _router(_supplier(), tools)
+    reply = await router.route("s1", router.sessions.session, "Show my inventory")
+    assert reply["content"] == "check_supplier_stock ok"
+    assert reply["metadata"] == {"intent": "check_stock", "route": "fast_path"}
+    assert tools.calls == [("check_supplier_stock", {})]
@@ -18,3 +18,180 @@ async def test_session_manager_basics():
     ctx = await sm.get_conversation_context(sid, 1)
     assert ctx and ctx[-1]["content"] == "hello"
 
+
+
+class _CountingRedis:
+    """Minimal in-memory stand-in for the redis calls SessionManager makes; counts round trips."""
+
+    def __init__(self):
+        self.kv = {}
+        self.round_trips = 0
+
+    def _run(self, op, key, *args, **kwargs):
+        if op == "get":
+            return self.kv.get(key)
+        if op == "hgetall":
+            return dict(self.kv.get(key) or {})
+        if op == "hset":
+            self.kv.setdefault(key, {}).update(kwargs["mapping"])
+            return len(kwargs["mapping"])
+        if op == "rpush":
+            self.kv.setdefault(key, []).extend(args)
+            return len(self.kv[key])
+        if op == "ltrim":
+            start, end = args
+            lst = self.kv.get(key) or []
+            self.kv[key] = lst[start:] if end == -1 else lst[start:end + 1]
+            return True
+        if op == "lrange":
+            start, end = args
+            lst = self.kv.get(key) or []
+            return lst[start:] if end == -1 else lst[start:end + 1]
+        if op == "delete":
+            return int(self.kv.pop(key, None) is not None)
+        if op == "expire":
+            return key in self.kv
+        raise AssertionError(f"unexpected redis op {op}")
+
+    def __getattr__(self, op):
+        async def call(key, *args, **kwargs):
+            self.round_trips += 1
+            return self._run(op, key, *args, **kwargs)
+        return call
+
+    def pipeline(self, transaction=True):
+        return _CountingPipeline(self)
+
+
+class _CountingPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, op):
+        def queue(key, *args, **kwargs):
+            self.ops.append((op, key, args, kwargs))
+        return queue
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [self.redis._run(op, key, *args, **kwargs) for op, key, args, kwargs in self.ops]
+
+
+@pytest.mark.asyncio
+async def test_session_turn_loads_once_and_flushes_once():
+    from app.orchestrator.session_manager import SessionManager
+
+    sm = SessionManager()
+    sm.redis = _CountingRedis()
+    sid = await sm.create_session()
+    sm.redis.round_trips = 0
+
+    async with sm.turn(sid):
+        await sm.add_message(sid, "user", "hello")
+        session = await sm.get_session(sid)
+        await sm.update_session(sid, {"context": {**session["context"], "last_intent": "general_chat"}})
+        await sm.add_message(sid, "assistant", "hi")
+        assert [m["content"] for m in await sm.get_conversation_context(sid)] == ["hello", "hi"]
+        assert sm.redis.round_trips == 1  # the initial load only
+
+    assert sm.redis.round_trips == 2  # one write on exit
+    stored = await sm.get_session(sid)
+    assert [m["content"] for m in stored["conversation_history"]] == ["hello", "hi"]
+    assert stored["context"]["last_intent"] == "general_chat"
+
+
+@pytest.mark.asyncio
+async def test_session_turn_creates_missing_session():
+    from app.orchestrator.session_manager import SessionManager
+
+    sm = SessionManager()
+    sm.redis = _CountingRedis()
+    async with sm.turn("fresh-id") as turn:
+        assert turn.data["session_id"] == "fresh-id"
+        await sm.add_message("fresh-id", "user", "selam")
+
+    stored = await sm.get_session("fresh-id")
+    assert stored["registered"] is False
+    assert stored["conversation_history"][0]["content"] == "selam"
+
+
+@pytest.mark.asyncio
+async def test_session_history_is_a_capped_list():
+    from app.orchestrator.session_manager import SessionManager
+
+    sm = SessionManager()
+    sm.redis = _CountingRedis()
+    sm.max_history = 3
+    sid = await sm.create_session()
+    for i in range(5):
+        await sm.add_message(sid, "user", f"m{i}")
+
+    assert len(sm.redis.kv[f"session:{sid}:history"]) == 3
+    ctx = await sm.get_conversation_context(sid, 2)
+    assert [m["content"] for m in ctx] == ["m3", "m4"]
+    # Field updates touch only the hash
+    await sm.update_session(sid, {"registered": True})
+    session = await sm.get_session(sid)
+    assert session["registered"] is True and len(session["conversation_history"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_legacy_json_session_is_migrated_on_read():
+    import json
+    from app.orchestrator.session_manager import SessionManager
+
+    sm = SessionManager()
+    sm.redis = _CountingRedis()
+    legacy = {"session_id": "old", "registered": True, "name": "Abebe",
+              "context": {"current_flow": "idle"},
+              "conversation_history": [{"role": "user", "content": "hi", "timestamp": 1.0}]}
+    sm.redis.kv["session:old"] = json.dumps(legacy)
+
+    session = await sm.get_session("old")
+    assert session["name"] == "Abebe"
+    assert session["conversation_history"][0]["content"] == "hi"
+    assert "session:old" not in sm.redis.kv
+    assert "session:old:meta" in sm.redis.kv
+
+
+class _RecordingLLM:
+    def __init__(self):
+        self.messages = []
+
+    async def achat(self, messages, tools=None, allow_tools=True):
+        self.messages.append(messages)
+        return {"type": "text", "content": "Welcome! Are you a customer or a supplier?"}
+
+
+@pytest.mark.asyncio
+async def test_first_turn_sends_user_message_once_with_onboarding():
+    from app.orchestrator.conversation import ConversationOrchestrator
+    from app.orchestrator.session_manager import SessionManager
+
+    sm = SessionManager()
+    sm.redis = _CountingRedis()
+    llm = _RecordingLLM()
+    orch = ConversationOrchestrator(sessions=sm, tools=object(), llm=llm, db=object())
+    orch.router = None
+    sid = await sm.create_session()
+
+    await orch.process_message(sid, "hi there")
+
+    messages = llm.messages[0]
+    assert [m["content"] for m in messages[1:]] == ["hi there"]
+    assert "Onboarding (first turn" in messages[0]["content"]
+
+    # Second turn: history holds the first exchange, the new message appears once, no onboarding
+    await orch.process_message(sid, "I want tomatoes")
+    messages = llm.messages[1]
+    assert [m["content"] for m in messages[1:]] == [
+        "hi there", "Welcome! Are you a customer or a supplier?", "I want tomatoes",
+    ]
+    assert "Onboarding (first turn" not in messages[0]["content"]
@@ -0,0 +1,197 @@
+import pytest
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Product:
+    def __init__(self, product_id, product_name):
+        self.product_id = product_id
+        self.product_name = product_name
+
+
+class FakeCatalogDB:
+    def __init__(self):
+        self.calls = []
+        self.products = [_Product(1, "Tomato"), _Product(2, "Onion"), _Product(3, "Carrot")]
+
+    async def search_products_ranked(self, query):
+        self.calls.append("search_products_ranked")
+        return [(p, 1.0 - 0.1 * i) for i, p in enumerate(self.products)]
+
+    async def get_availability_summary(self, product_ids):
+        ids = list(product_ids)
+        self.calls.append(("get_availability_summary", ids))
+        return {
+            1: {"available_quantity_kg": 15.5, "min_price_per_unit": 45.0},
+            2: {"available_quantity_kg": 3.0, "min_price_per_unit": 30.0},
+        }
+
+    async def get_all_products(self):
+        return self.products
+
+    async def get_available_inventory(self, product_id):
+        raise AssertionError("per-product inventory loads should not be used for listings")
+
+
+def _registry(db):
+    from app.orchestrator.tool_registry import ToolRegistry
+
+    return ToolRegistry(db=db, rag=object(), images=object(), sessions=object())
+
+
+async def test_search_products_uses_one_availability_query():
+    db = FakeCatalogDB()
+    res = await _registry(db).execute("search_products", {"query": "vegetables"})
+
+    assert res["success"]
+    assert db.calls == ["search_products_ranked", ("get_availability_summary", [1, 2, 3])]
+    by_name = {d["product_name"]: d for d in res["data"]}
+    assert by_name["Tomato"]["available_quantity_kg"] == 15.5
+    assert by_name["Tomato"]["min_price_per_unit"] == 45.0
+    assert by_name["Carrot"]["min_price_per_unit"] is None
+    assert by_name["Tomato"]["score"] == 1.0
+    assert "Carrot: currently no active inventory" in res["message"]
+
+
+class FakeOrdersDB:
+    def __init__(self, n_orders):
+        self.n_orders = n_orders
+        self.calls = []
+
+    async def get_customer_orders(self, customer_id, status=None, start_date=None, end_date=None, limit=None, after=None):
+        self.calls.append({"status": status, "start_date": start_date, "end_date": end_date, "limit": limit})
+        n = min(self.n_orders, limit or self.n_orders)
+        return [
+            {"order_id": f"o{i}", "delivery_date": start_date, "delivery_location": "Bole",
+             "total_amount": 100.0, "status": status or "pending",
+             "items": [{"product_name": "Tomato", "quantity_kg": 2.0}]}
+            for i in range(n)
+        ]
+
+
+class FakeSessions:
+    async def get_session(self, session_id):
+        return {"registered": True, "user_id": "cust-1"}
+
+
+async def test_customer_orders_filters_and_pages_in_sql():
+    import datetime as dt
+    from app.orchestrator.tool_registry import ToolRegistry, _ORDERS_PAGE_SIZE
+
+    db = FakeOrdersDB(n_orders=50)
+    tools = ToolRegistry(db=db, rag=object(), images=object(), sessions=FakeSessions())
+    res = await tools.execute(
+        "get_customer_orders",
+        {"start_date": "2025-01-01", "end_date": "2025-01-31", "status": "confirmed"},
+        session_id="s1",
+    )
+
+    assert res["success"]
+    assert db.calls == [{"status": "confirmed", "start_date": dt.date(2025, 1, 1),
+                         "end_date": dt.date(2025, 1, 31), "limit": _ORDERS_PAGE_SIZE + 1}]
+    assert len(res["data"]) == _ORDERS_PAGE_SIZE
+    assert f"Showing your {_ORDERS_PAGE_SIZE} most recent orders" in res["message"]
+
+
+class FakePlaceOrderDB:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    async def place_order(self, customer_id, delivery_date, delivery_location, items):
+        self.calls.append(items)
+        if self.error:
+            raise self.error
+        return {
+            "order_id": "o1",
+            "total": 91.0,
+            "items": [{"product_id": 1, "product_name": "Tomato", "quantity_kg": 2.0, "price_per_unit": 45.5}],
+        }
+
+
+async def test_create_order_places_order_in_one_call():
+    import datetime as dt
+    from app.orchestrator.tool_registry import ToolRegistry
+
+    db = FakePlaceOrderDB()
+    tools = ToolRegistry(db=db, rag=object(), images=object(), sessions=FakeSessions())
+    args = {
+        "items": [{"product_name": "Tomato", "quantity_kg": 2}],
+        "delivery_date": (dt.date.today() + dt.timedelta(days=1)).isoformat(),
+        "delivery_location": "Bole",
+    }
+    res = await tools.execute("create_order", args, session_id="s1")
+
+    assert res["success"]
+    assert db.calls == [[{"product_name": "Tomato", "quantity_kg": 2.0}]]
+    assert res["data"]["order_id"] == "o1" and res["data"]["total"] == 91.0
+
+
+async def test_create_order_reports_insufficient_stock():
+    import datetime as dt
+    from app.orchestrator.tool_registry import ToolRegistry
+    from app.services.exceptions import InsufficientInventoryError
+
+    db = FakePlaceOrderDB(InsufficientInventoryError("Not enough available inventory for 'Tomato'"))
+    tools = ToolRegistry(db=db, rag=object(), images=object(), sessions=FakeSessions())
+    args = {
+        "items": [{"product_name": "Tomato", "quantity_kg": 500}],
+        "delivery_date": dt.date.today().isoformat(),
+        "delivery_location": "Bole",
+    }
+    res = await tools.execute("create_order", args, session_id="s1")
+
+    assert not res["success"]
+    assert "Not enough available inventory" in res["message"]
+
+
+class FakeRag:
+    def __init__(self, rows):
+        self.rows = rows
+        self.searches = []
+
+    async def async_lookup(self, product_name, category):
+        return self.rows.get((product_name, category))
+
+    async def async_semantic_search(self, query, n_results=None, category=None, product_name=None):
+        self.searches.append((query, category, product_name))
+        return {"documents": [["Tomato general: versatile."]],
+                "metadatas": [[{"product_name": "Tomato", "category": "general"}]], "distances": [[0.3]]}
+
+
+async def test_rag_query_uses_exact_lookup_when_product_and_category_known():
+    from app.orchestrator.tool_registry import ToolRegistry
+
+    rag = FakeRag({("Tomato", "storage"): {
+        "id": "kb_x", "document": "Tomato storage: keep at room temperature.",
+        "metadata": {"product_name": "Tomato", "category": "storage"},
+    }})
+    tools = ToolRegistry(db=FakeCatalogDB(), rag=rag, images=object(), sessions=object())
+
+    res = await tools.execute("rag_query", {"query": "how do I store tomato?"})
+    assert res["success"]
+    assert res["message"] == "keep at room temperature."
+    assert rag.searches == []
+
+    res = await tools.execute("rag_query", {"query": "tell me about tomato"})
+    assert res["success"]
+    assert rag.searches == [("tell me about tomato", None, "Tomato")]
+
+
+@pytest.mark.parametrize("qty, expected", [(None, "quantity in kg"), ("lots", "quantity in kg"), (0, "more than 0 kg")])
+async def test_create_order_rejects_missing_or_invalid_quantity(qty, expected):
+    import datetime as dt
+    from app.orchestrator.tool_registry import ToolRegistry
+
+    db = FakePlaceOrderDB()
+    tools = ToolRegistry(db=db, rag=object(), images=object(), sessions=FakeSessions())
+    item = {"product_name": "Tomato"}
+    if qty is not None:
+        item["quantity_kg"] = qty
+    args = {"items": [item], "delivery_date": dt.date.today().isoformat(), "delivery_location": "Bole"}
+    res = await tools.execute("create_order", args, session_id="s1")
+
+    assert not res["success"]
+    assert expected in res["message"]
+    assert db.calls == []
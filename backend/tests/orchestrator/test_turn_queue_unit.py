@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_turns_for_one_session_run_serially_and_coalesce():
+    from app.orchestrator.turn_queue import TurnQueue
+
+    q = TurnQueue()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    running = 0
+    max_running = 0
+    turns = []
+
+    async def run(text):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        turns.append(text)
+        started.set()
+        await release.wait()
+        running -= 1
+        return f"reply to {text!r}"
+
+    first = asyncio.create_task(q.submit("s1", "hi", run))
+    await started.wait()
+    # These arrive while the first turn is still in flight
+    second = asyncio.create_task(q.submit("s1", "I need tomatoes", run))
+    third = asyncio.create_task(q.submit("s1", "5 kg please", run))
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(first, second, third)
+    assert max_running == 1
+    assert turns == ["hi", "I need tomatoes\n5 kg please"]
+    assert results == ["reply to 'hi'", "reply to 'I need tomatoes\\n5 kg please'", None]
+    assert q._lanes == {}
+
+
+async def test_sessions_do_not_block_each_other():
+    from app.orchestrator.turn_queue import TurnQueue
+
+    q = TurnQueue()
+    release = asyncio.Event()
+
+    async def slow(text):
+        await release.wait()
+        return text
+
+    async def fast(text):
+        return text
+
+    blocked = asyncio.create_task(q.submit("s1", "slow", slow))
+    await asyncio.sleep(0)
+    assert await asyncio.wait_for(q.submit("s2", "fast", fast), timeout=1) == "fast"
+    release.set()
+    assert await blocked == "slow"
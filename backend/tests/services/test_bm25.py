@@ -0,0 +1,32 @@
+from app.services.bm25 import BM25Index, matches, rrf, tokenize
+
+
+DOCS = [
+    ("a", "Red Onion (ሃበሻ) storage: keep cool and dry.", {"product_name": "Red Onion (ሃበሻ)", "category": "storage"}),
+    ("b", "Red Onion (ሃበሻ) recipes: Doro Wat and Shiro.", {"product_name": "Red Onion (ሃበሻ)", "category": "recipes"}),
+    ("c", "Tomato storage: keep at room temperature.", {"product_name": "Tomato", "category": "storage"}),
+]
+
+
+def _index():
+    ids, docs, metas = zip(*DOCS)
+    return BM25Index(ids, docs, metas)
+
+
+def test_tokenize_keeps_ethiopic_words():
+    assert tokenize("Red Onion (ሃበሻ)") == ["red", "onion", "ሃበሻ"]
+
+
+def test_bm25_ranks_rare_terms_and_honours_where():
+    index = _index()
+    assert {index.ids[r] for r, _ in index.search("ሃበሻ", 5)} == {"a", "b"}
+    assert index.ids[index.search("onion storage", 5)[0][0]] == "a"
+    assert [index.ids[r] for r, _ in index.search("storage", 5, {"product_name": {"$eq": "Tomato"}})] == ["c"]
+    assert index.search("mango", 5) == []
+
+
+def test_matches_and_rrf():
+    where = {"$and": [{"category": {"$eq": "storage"}}, {"product_name": {"$eq": "Tomato"}}]}
+    assert matches(DOCS[2][2], where) and not matches(DOCS[0][2], where)
+    fused = rrf([["x", "y"], ["y", "z"]])
+    assert [doc_id for doc_id, _ in fused] == ["y", "x", "z"]
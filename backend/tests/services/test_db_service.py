@@ -10,5 +10,58 @@ async def test_db_service_import_and_methods_exist():
     # Ensure methods are callable
     assert hasattr(db, "get_all_products")
     assert hasattr(db, "search_products")
+    assert hasattr(db, "search_products_ranked")
     assert hasattr(db, "calculate_pricing_recommendation")
+    assert hasattr(db, "calculate_pricing_recommendations")
+    assert hasattr(db, "get_availability_summary")
 
+
+def test_pricing_result_falls_back_to_historical_average():
+    from app.services.db_service import _pricing_result
+
+    with_farm = _pricing_result(1, "Tomato", {"farm": 40.0, "supermarket": 55.0}, 38.0)
+    assert with_farm["recommended"] == 44.0
+    assert with_farm["distribution_avg"] is None
+
+    no_farm = _pricing_result(1, "Tomato", {}, 50.0)
+    assert no_farm["recommended"] == 55.0
+
+    empty = _pricing_result(999, None, {}, None)
+    assert empty["recommended"] == 0.0 and empty["product_name"] is None
+
+
+def test_settle_allocations_weights_price_across_lots():
+    from decimal import Decimal as D
+    from types import SimpleNamespace as NS
+    from app.services.db_service import _settle_allocations
+
+    tomato = NS(product_id=1, product_name="Tomato")
+    rows = [
+        NS(line_no=0, inventory_id=7, take_kg=D("3"), current_kg=D("3"), price_per_unit=D("30")),
+        NS(line_no=0, inventory_id=9, take_kg=D("2"), current_kg=D("4"), price_per_unit=D("10")),
+        NS(line_no=1, inventory_id=9, take_kg=D("1"), current_kg=D("4"), price_per_unit=D("10")),
+    ]
+    items, lots, total = _settle_allocations([(tomato, D("5")), (tomato, D("1"))], rows)
+
+    assert [it["price_per_unit"] for it in items] == [22.0, 10.0]
+    assert [len(it["allocations"]) for it in items] == [2, 1]
+    assert lots == {7: D("0"), 9: D("1")}
+    assert total == D("120.00")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("qty", [0, -2, "abc", None, "NaN", "0.001", 0.004])
+async def test_place_order_rejects_non_positive_quantities_before_touching_the_db(qty):
+    import datetime as dt
+
+    from app.services.db_service import DatabaseService
+    from app.services.exceptions import DatabaseError
+
+    db = DatabaseService()
+
+    def no_session():
+        raise AssertionError("no session should be opened for an invalid order")
+
+    db._session_factory = no_session
+    with pytest.raises(DatabaseError, match="positive number"):
+        await db.place_order("c1", dt.date.today(), "Bole", [{"product_name": "Tomato", "quantity_kg": qty}])
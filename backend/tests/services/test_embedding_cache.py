@@ -0,0 +1,67 @@
+from app.services.embedding_cache import EmbeddingCache, cache_key
+
+
+class FakeRedis:
+    """The slice of redis.Redis the cache uses: mget, set and a pipeline."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+
+class BrokenRedis(FakeRedis):
+    def mget(self, keys):
+        raise ConnectionError("redis down")
+
+    def pipeline(self, transaction=True):
+        raise ConnectionError("redis down")
+
+
+def test_cache_key_depends_on_model_and_text():
+    assert cache_key("m", "tomato") == cache_key("m", "tomato")
+    assert cache_key("m", "tomato") != cache_key("m2", "tomato")
+    assert cache_key("m", "tomato") != cache_key("m", "tomatoes")
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    assert cache.get_many("m", ["a"]) == [[1.0]]  # "a" is now most recent
+    cache.put_many("m", ["c"], [[3.0]])
+
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+    assert cache.stats["memory_hits"] == 3
+    assert cache.stats["misses"] == 1
+
+
+def test_redis_tier_survives_a_new_process_and_keeps_exact_floats():
+    redis = FakeRedis()
+    EmbeddingCache(redis_client=redis, ttl=60).put_many("m", ["a"], [[0.1, -2.5]])
+    assert set(redis.ttls.values()) == {60}
+
+    fresh = EmbeddingCache(redis_client=redis)
+    assert fresh.get_many("m", ["a", "b"]) == [[0.1, -2.5], None]
+    assert fresh.stats == {"memory_hits": 0, "redis_hits": 1, "misses": 1, "redis_errors": 0}
+    # Promoted into memory
+    assert fresh.get_many("m", ["a"]) == [[0.1, -2.5]]
+    assert fresh.stats["memory_hits"] == 1
+
+
+def test_redis_errors_degrade_to_misses():
+    cache = EmbeddingCache(redis_client=BrokenRedis())
+    cache.put_many("m", ["a"], [[1.0]])
+    assert cache.get_many("m", ["a", "b"]) == [[1.0], None]
+    assert cache.stats["redis_errors"] == 2
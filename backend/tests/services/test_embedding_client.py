@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+
+class _Resp:
+    def __init__(self, status, body=None, headers=None):
+        self.status_code = status
+        self._body = body or {}
+        self.headers = headers or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    """Answers batchEmbedContents with [len(text)] vectors; optional canned failures first."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def post(self, url, json, headers, timeout):
+        assert url.endswith(":batchEmbedContents")
+        with self._lock:
+            if self.failures:
+                return self.failures.pop(0)
+            texts = [r["content"]["parts"][0]["text"] for r in json["requests"]]
+            self.batches.append(texts)
+        return _Resp(200, {"embeddings": [{"values": [float(len(t))]} for t in texts]})
+
+
+def _client(session, **kw):
+    from app.services.embedding_client import EmbeddingClient
+
+    return EmbeddingClient(api_key="k", session=session, **kw)
+
+
+def test_embed_batches_in_order_across_workers():
+    session = FakeSession()
+    texts = ["x" * (i + 1) for i in range(25)]
+    vectors = _client(session, batch_size=10, concurrency=3).embed(texts)
+
+    assert vectors == [[float(i + 1)] for i in range(25)]
+    assert sorted(len(b) for b in session.batches) == [5, 10, 10]
+
+
+def test_embed_retries_throttling_then_succeeds(monkeypatch):
+    import app.services.embedding_client as ec
+
+    monkeypatch.setattr(ec.time, "sleep", lambda s: None)
+    session = FakeSession(failures=[_Resp(429, headers={"Retry-After": "0"}), _Resp(503)])
+    assert _client(session, max_retries=3).embed(["ab"]) == [[2.0]]
+
+
+def test_embed_raises_on_client_error_without_retry():
+    session = FakeSession(failures=[_Resp(400, {"error": "bad request"})])
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        _client(session).embed(["ab"])
+    assert session.batches == []
+
+
+def test_embed_with_cache_sends_only_unseen_texts_once():
+    from app.services.embedding_cache import EmbeddingCache
+
+    session = FakeSession()
+    client = _client(session, cache=EmbeddingCache())
+    assert client.embed(["ab", "abc", "ab"]) == [[2.0], [3.0], [2.0]]
+    assert session.batches == [["ab", "abc"]]
+
+    assert client.embed(["abc", "abcd"]) == [[3.0], [4.0]]
+    assert session.batches[-1] == ["abcd"]
+    assert client.embed(["ab", "abcd"]) == [[2.0], [4.0]]
+    assert len(session.batches) == 2
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+
+class FakeSweepDB:
+    def __init__(self, fail_first=False):
+        self.calls = []
+        self.fail_first = fail_first
+
+    async def sweep_inventory(self, batch_size):
+        self.calls.append(batch_size)
+        if self.fail_first and len(self.calls) == 1:
+            raise RuntimeError("db down")
+        return {"expired": 2, "sold_out": 1}
+
+
+@pytest.mark.asyncio
+async def test_run_once_returns_moved_counts():
+    from app.services.inventory_sweeper import InventorySweeper
+
+    db = FakeSweepDB()
+    moved = await InventorySweeper(db, batch_size=50).run_once()
+
+    assert moved == {"expired": 2, "sold_out": 1}
+    assert db.calls == [50]
+
+
+@pytest.mark.asyncio
+async def test_loop_survives_failures_and_stops():
+    from app.services.inventory_sweeper import InventorySweeper
+
+    db = FakeSweepDB(fail_first=True)
+    sweeper = InventorySweeper(db, interval=0.01)
+    sweeper.start()
+    await asyncio.sleep(0.05)
+    await sweeper.stop()
+
+    assert len(db.calls) >= 2
+    n = len(db.calls)
+    await asyncio.sleep(0.03)
+    assert len(db.calls) == n
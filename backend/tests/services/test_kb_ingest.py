@@ -0,0 +1,133 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+class FakeCollection:
+    """In-memory stand-in for the Chroma collection calls used by ingest."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, include=None, limit=None, offset=0):
+        ids = sorted(self.rows)[offset : offset + limit]
+        return {
+            "ids": ids,
+            "documents": [self.rows[i]["document"] for i in ids],
+            "metadatas": [self.rows[i]["metadata"] for i in ids],
+        }
+
+    def query(self, query_embeddings, n_results, where=None):
+        ids = sorted(self.rows)[:n_results]
+        return {
+            "ids": [ids],
+            "documents": [[self.rows[i]["document"] for i in ids]],
+            "metadatas": [[self.rows[i]["metadata"] for i in ids]],
+            "distances": [[0.5] * len(ids)],
+        }
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.rows[i] = {"document": d, "metadata": m, "embedding": e}
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def _service():
+    from app.services.rag_service import VectorDBService
+
+    s = VectorDBService(api_key="", backend="numpy")
+    s.client, s.collection, s.embedder = object(), FakeCollection(), CountingEmbedder()
+    return s
+
+
+def _write(tmp_path, rows):
+    path = tmp_path / "kb.csv"
+    pd.DataFrame(rows, columns=["product_name", "category", "embedding_text"]).to_csv(path, index=False)
+    return str(path)
+
+
+KB = [
+    ("Tomato", "storage", "Tomato storage: keep at room temperature."),
+    ("Tomato", "recipes", "Tomato recipes: salsa."),
+    ("Onion", "storage", "Onion storage: cool and dry."),
+]
+
+
+def test_reingest_unchanged_or_reordered_kb_embeds_nothing(tmp_path):
+    s = _service()
+    assert s.ingest_knowledge_base(_write(tmp_path, KB)) == 3
+    assert len(s.embedder.calls[0]) == 3
+    ids = set(s.collection.rows)
+
+    s.ingest_knowledge_base(_write(tmp_path, list(reversed(KB))))
+    assert len(s.embedder.calls) == 1
+    assert set(s.collection.rows) == ids
+
+
+def test_ingest_embeds_only_edits_and_removes_deleted_rows(tmp_path):
+    s = _service()
+    s.collection.upsert(["kb_0"], ["legacy"], [{"product_name": "Tomato", "category": "storage"}], [[0.0]])
+    s.ingest_knowledge_base(_write(tmp_path, KB))
+
+    edited = [KB[0], (KB[1][0], KB[1][1], "Tomato recipes: salsa and shakshuka.")]
+    s.ingest_knowledge_base(_write(tmp_path, edited))
+
+    assert s.embedder.calls[-1] == ["Tomato recipes: salsa and shakshuka."]
+    docs = sorted(r["document"] for r in s.collection.rows.values())
+    assert docs == ["Tomato recipes: salsa and shakshuka.", "Tomato storage: keep at room temperature."]
+
+
+def test_lookup_answers_exact_keys_without_embedding(tmp_path):
+    s = _service()
+    s.ingest_knowledge_base(_write(tmp_path, KB))
+    calls = len(s.embedder.calls)
+
+    hit = s.lookup("  tomato ", "RECIPES")
+    assert hit["document"] == "Tomato recipes: salsa."
+    assert s.lookup("Tomato", "nutrition") is None
+    assert len(s.embedder.calls) == calls
+
+    # A fresh service (another worker) builds the index from the collection
+    other = _service()
+    other.collection = s.collection
+    assert other.lookup("Onion", "storage")["metadata"]["product_name"] == "Onion"
+
+
+def test_lexical_first_skips_embedding_for_a_product_name(tmp_path):
+    s = _service()
+    s.ingest_knowledge_base(_write(tmp_path, KB))
+    calls = len(s.embedder.calls)
+
+    res = s.semantic_search("onion", n_results=3, mode="lexical_first")
+    assert [m["product_name"] for m in res["metadatas"][0]] == ["Onion"]
+    assert res["distances"][0] == [1.0]
+    assert len(s.embedder.calls) == calls
+
+    # "storage" is in two products' rows: not decisive, so fuse with the vector ranking
+    res = s.semantic_search("storage", n_results=3, mode="lexical_first")
+    assert len(s.embedder.calls) == calls + 1
+    assert len(res["ids"][0]) == 3
+    assert res["scores"][0] == sorted(res["scores"][0], reverse=True)
+    assert all(isinstance(d, float) for d in res["distances"][0])
+
+
+def test_semantic_search_defaults_to_vector_only(tmp_path):
+    s = _service()
+    s.ingest_knowledge_base(_write(tmp_path, KB))
+    calls = len(s.embedder.calls)
+
+    res = s.semantic_search("onion", n_results=3)
+    assert len(s.embedder.calls) == calls + 1
+    assert "scores" not in res
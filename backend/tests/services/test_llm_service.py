@@ -1,6 +1,8 @@
 import importlib
 from types import SimpleNamespace
 
+import pytest
+
 
 def test_tool_declarations_have_all_tools():
     mod = importlib.import_module("app.services.llm_service")
@@ -105,3 +107,164 @@ def test_llm_service_parses_text(monkeypatch):
     assert out["type"] == "text"
     assert out["content"] == "Hello there"
 
+
+
+@pytest.mark.asyncio
+async def test_llm_service_achat_runs_off_loop(monkeypatch):
+    import threading
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    seen_threads = []
+
+    class FakePartText:
+        def __init__(self):
+            self.text = "async hello"
+            self.function_call = None
+
+    class FakeResp:
+        def __init__(self):
+            self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[FakePartText()]))]
+
+    class FakeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, messages):
+            seen_threads.append(threading.current_thread().name)
+            return FakeResp()
+
+    llm_mod = importlib.import_module("app.services.llm_service")
+    monkeypatch.setattr(llm_mod.genai, "GenerativeModel", FakeModel, raising=True)
+    monkeypatch.setattr(llm_mod.genai, "configure", lambda **kwargs: None, raising=True)
+
+    importlib.reload(llm_mod)
+    svc = llm_mod.LLMService()
+    out = await svc.achat([{"role": "user", "content": "hi"}])
+    assert out == {"type": "text", "content": "async hello"}
+    assert seen_threads and seen_threads[0].startswith("llm")
+
+
+@pytest.mark.asyncio
+async def test_llm_service_achat_timeout(monkeypatch):
+    import time
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    class SlowModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, messages):
+            time.sleep(0.5)
+            return SimpleNamespace(candidates=[])
+
+    llm_mod = importlib.import_module("app.services.llm_service")
+    monkeypatch.setattr(llm_mod.genai, "GenerativeModel", SlowModel, raising=True)
+    monkeypatch.setattr(llm_mod.genai, "configure", lambda **kwargs: None, raising=True)
+
+    importlib.reload(llm_mod)
+    svc = llm_mod.LLMService()
+    svc._timeout = 0.05
+    from app.services.exceptions import LLMTimeoutError
+
+    with pytest.raises(LLMTimeoutError):
+        await svc.achat([{"role": "user", "content": "hi"}])
+
+
+def test_model_registry_builds_each_combination_once(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    built = []
+
+    class CountingModel:
+        def __init__(self, *args, **kwargs):
+            built.append((args, kwargs))
+
+        def generate_content(self, messages):
+            return SimpleNamespace(candidates=[])
+
+    llm_mod = importlib.import_module("app.services.llm_service")
+    monkeypatch.setattr(llm_mod.genai, "GenerativeModel", CountingModel, raising=True)
+    monkeypatch.setattr(llm_mod.genai, "configure", lambda **kwargs: None, raising=True)
+
+    importlib.reload(llm_mod)
+    svc = llm_mod.LLMService()
+    assert len(built) == 1  # default tool-enabled model
+
+    decls = llm_mod.tool_declarations()
+    assert decls is llm_mod.tool_declarations()
+    for _ in range(3):
+        svc.chat([{"role": "user", "content": "hi"}], tools=decls)
+        svc.chat([{"role": "user", "content": "hi"}], tools=llm_mod._tool_declarations())
+        svc.chat([{"role": "user", "content": "hi"}], allow_tools=False)
+    # Equal tool sets share one model; the tool-less finalization model is built once
+    assert len(built) == 2
+
+
+@pytest.mark.asyncio
+async def test_llm_service_astream_yields_deltas_then_final(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    def _chunk(text):
+        part = SimpleNamespace(text=text, function_call=None)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+    class StreamingModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, messages, stream=False):
+            assert stream is True
+            return iter([_chunk("Hello"), _chunk(" there"), _chunk("!")])
+
+    llm_mod = importlib.import_module("app.services.llm_service")
+    monkeypatch.setattr(llm_mod.genai, "GenerativeModel", StreamingModel, raising=True)
+    monkeypatch.setattr(llm_mod.genai, "configure", lambda **kwargs: None, raising=True)
+
+    importlib.reload(llm_mod)
+    svc = llm_mod.LLMService()
+
+    events = [ev async for ev in svc.astream([{"role": "user", "content": "hi"}])]
+    assert [e["content"] for e in events if e["type"] == "delta"] == ["Hello", " there", "!"]
+    assert events[-1] == {"type": "text", "content": "Hello there!"}
+
+
+def test_llm_service_returns_every_function_call(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    def _fc_part(name, args):
+        return SimpleNamespace(function_call=SimpleNamespace(name=name, args=args))
+
+    class FakeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, messages):
+            parts = [
+                _fc_part("get_pricing_insights", {"product_name": "Tomato"}),
+                _fc_part("get_pricing_insights", {"product_name": "Onion"}),
+                _fc_part("search_products", {"query": "vegetables"}),
+            ]
+            return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+    llm_mod = importlib.import_module("app.services.llm_service")
+    monkeypatch.setattr(llm_mod.genai, "GenerativeModel", FakeModel, raising=True)
+    monkeypatch.setattr(llm_mod.genai, "configure", lambda **kwargs: None, raising=True)
+
+    importlib.reload(llm_mod)
+    out = llm_mod.LLMService().chat([{"role": "user", "content": "hi"}])
+    assert out["type"] == "tool_call"
+    assert out["name"] == "get_pricing_insights"
+    assert [c["name"] for c in out["calls"]] == ["get_pricing_insights", "get_pricing_insights", "search_products"]
+    assert out["calls"][1]["arguments"] == {"product_name": "Onion"}
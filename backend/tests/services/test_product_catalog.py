@@ -0,0 +1,64 @@
+import pytest
+
+
+class _P:
+    def __init__(self, product_id, product_name):
+        self.product_id = product_id
+        self.product_name = product_name
+
+
+NAMES = ["Avocado", "Banana", "Carrot", "Cabbage", "Onion (Red)", "Potato", "Tomato", "Milk"]
+
+
+def _catalog(shortlist=16):
+    from app.services.product_catalog import ProductCatalog
+
+    c = ProductCatalog(shortlist=shortlist)
+    c.load([_P(i, n) for i, n in enumerate(NAMES, start=1)], version=1)
+    return c
+
+
+def test_exact_and_case_insensitive_lookup():
+    c = _catalog()
+    assert c.get("Tomato").product_id == 7
+    assert c.get(" tomato ").product_id == 7
+    assert c.get("tomatoes") is None
+
+
+def test_fuzzy_matches_full_scan_for_misspellings():
+    from difflib import SequenceMatcher
+
+    c = _catalog(shortlist=3)
+    for query in ["tomatoe", "bananna", "potatos", "cabage", "onion red", "avacado"]:
+        expected = max(NAMES, key=lambda n: SequenceMatcher(None, query, n.lower()).ratio())
+        best, score = c.fuzzy(query, threshold=0.6)
+        assert best is not None and best.product_name == expected, query
+
+
+def test_fuzzy_below_threshold_returns_score_only():
+    best, score = _catalog().fuzzy("xylophone", threshold=0.8)
+    assert best is None and score < 0.8
+
+
+@pytest.mark.asyncio
+async def test_refresh_reloads_only_when_version_moves():
+    from app.services.product_catalog import ProductCatalog
+
+    c = ProductCatalog(check_interval=0)
+    loads = []
+    version = {"v": 1}
+
+    async def loader():
+        loads.append(1)
+        return [_P(1, "Tomato")] if len(loads) == 1 else [_P(1, "Tomato"), _P(2, "Mango")]
+
+    async def version_fn():
+        return version["v"]
+
+    await c.refresh_if_stale(loader, version_fn)
+    await c.refresh_if_stale(loader, version_fn)
+    assert len(loads) == 1 and c.get("Mango") is None
+
+    version["v"] = 2
+    await c.refresh_if_stale(loader, version_fn)
+    assert len(loads) == 2 and c.get("mango").product_id == 2
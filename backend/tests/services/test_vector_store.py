@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+def _store(tmp_path):
+    from app.services.vector_store import NumpyVectorStore
+
+    return NumpyVectorStore(str(tmp_path / "index"))
+
+
+def _seed(store):
+    store.upsert(
+        ids=["a", "b", "c"],
+        documents=["tomato storage", "tomato recipes", "onion storage"],
+        metadatas=[
+            {"product_name": "Tomato", "category": "storage"},
+            {"product_name": "Tomato", "category": "recipes"},
+            {"product_name": "Onion", "category": "storage"},
+        ],
+        embeddings=[[1.0, 0.0], [0.8, 0.6], [0.0, 2.0]],
+    )
+
+
+def test_query_ranks_by_cosine_in_chroma_shape(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    res = store.query(query_embeddings=[[10.0, 1.0]], n_results=2)
+
+    assert res["ids"] == [["a", "b"]]
+    assert res["documents"][0] == ["tomato storage", "tomato recipes"]
+    assert res["distances"][0][0] < res["distances"][0][1]
+
+
+def test_query_prefilters_on_metadata(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    where = {"$and": [{"category": {"$eq": "storage"}}, {"product_name": {"$eq": "Onion"}}]}
+    assert store.query(query_embeddings=[[1.0, 0.0]], n_results=3, where=where)["ids"] == [["c"]]
+    assert store.query(query_embeddings=[[0.0, 1.0]], n_results=3, where={"category": {"$eq": "storage"}})["ids"] == [["c", "a"]]
+    assert store.query(query_embeddings=[[1.0, 0.0]], n_results=3, where={"category": {"$eq": "none"}})["ids"] == [[]]
+
+
+def test_writes_persist_and_reach_other_readers(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    reader = _store(tmp_path)
+    assert reader.count() == 3
+
+    store.upsert(ids=["a"], documents=["tomato storage v2"], metadatas=[{"category": "storage"}],
+                 embeddings=[[0.0, 1.0]])
+    store.delete(ids=["b"])
+
+    assert sorted(reader.get()["ids"]) == ["a", "c"]
+    assert reader.get(ids=["a"])["documents"] == ["tomato storage v2"]
+    assert reader.query(query_embeddings=[[0.0, 1.0]], n_results=1)["ids"][0][0] in {"a", "c"}
+
+
+def test_each_write_switches_vectors_file_through_meta(tmp_path):
+    import json
+
+    store = _store(tmp_path)
+    _seed(store)
+    reader = _store(tmp_path)
+    mapped = reader.vectors
+
+    store.delete(ids=["b"])
+
+    meta = json.loads((tmp_path / "index" / "meta.json").read_text())
+    files = sorted(p.name for p in (tmp_path / "index").glob("vectors*.f32"))
+    assert files == [meta["vectors"]]
+    # The matrix a reader already mapped is unaffected until it refreshes onto the new pair
+    assert mapped.shape == (3, 2)
+    assert reader.count() == 2 and reader.vectors.shape == (2, 2)
@@ -12,13 +12,14 @@ function getBackendUrl(): string {
 
 export type ServerToClientEvents = {
   response: (payload: { content?: string; message?: string }) => void;
+  response_delta: (payload: { sessionId?: string; content: string }) => void;
   typing: (payload: { isTyping: boolean }) => void;
   session: (payload: { sessionId: string }) => void;
   app_error: (payload: { message: string }) => void;
 };
 
 export type ClientToServerEvents = {
-  message: (payload: { sessionId?: string; text: string }) => void;
+  message: (payload: { sessionId?: string; text: string; stream?: boolean }) => void;
   typing: (payload: { isTyping: boolean }) => void;
 };
 